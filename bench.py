@@ -0,0 +1,427 @@
+"""
+铁板神数排盘系统 - 性能基准测试
+通过 `python main.py bench render|calc|stress` 运行；旧版写法仅作对照保存在本文件中，
+main.py 只保留一份正式实现
+"""
+import os
+import io
+import contextlib
+import random
+import tempfile
+import asyncio
+import time
+import datetime
+
+from main import (TIANGAN, DIZHI, NAYIN_WUXING, UNKNOWN_SEQ, TieBanError, TieBanCalculator, TieBanService,
+                  convert_to_bazi_info, is_yang_gan, iter_birth_times, liunian_correction, liunian_groups)
+
+def _sample_results(calculator, n):
+    """生成 n 张用于基准测试的排盘结果（出生时间逐时辰递增）"""
+    query_info = convert_to_bazi_info(datetime.datetime(2025, 4, 20, 10, 0))
+    results = []
+    for gender, dt in zip(["男", "女"] * n, iter_birth_times(1950, 2020)):
+        if len(results) >= n:
+            break
+        results.append(calculator.calculate({
+            "birth_info": convert_to_bazi_info(dt), "query_info": query_info, "gender": gender}))
+    return results
+
+def _render_markdown_linewise(res, f, generated_at=None):
+    """
+    逐列 f-string 拼接、逐行写出的旧写法（与旧版 save_to_md 相同的组织方式），仅作基准对照
+    输出内容与 ReportRenderer.render_markdown 完全一致
+    """
+    generated_at = generated_at or datetime.datetime.now()
+    f.write("# 铁板神数排盘结果\n\n")
+    f.write(f"**排盘时间**: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    f.write(f"## 基础信息\n")
+    f.write(f"```\n{res['header_info']}\n```\n\n")
+    f.write("## 基础排盘\n")
+    f.write(f"- 先天命数：{res['cong_calc']}\n")
+    f.write(f"- 五音命数：{res['tone_num']}\n")
+    f.write(f"- 日命数 & 时运数：{res['day_life_calc']}\n")
+    f.write(f"- 考刻结果：{res['moment_calc']}\n")
+    f.write(f"- 本命数：{res['main_calc']}\n")
+    f.write(f"- 十二辟卦：{res['hex_name']}\n\n")
+    f.write("## 本命条文\n")
+    if res['tbl_data']:
+        tbl = res['tbl_data']
+        base, seq, offsets = tbl['base'], tbl['seq'], tbl['offsets']
+        f.write(f"**{res['moment_cn']}生人 - 先天命数 {res['cong_num']} - {res['hex_name']}(+{base})**\n\n")
+        f.write("| 项目 | 数值 | 计算公式 | 断语 | 断语年龄 |\n")
+        f.write("|------|------|----------|------|----------|\n")
+        f.write(f"| 序数 | {seq} | - | | |\n")
+        texts = {(item, off): (duanyu, age) for item, off, _, duanyu, age in res.get('benming', ())}
+        for item, values in offsets.items():
+            for val in values:
+                total = base + seq + val
+                duanyu, age = texts.get((item, val), ("", ""))
+                duanyu = duanyu.replace('|', '｜').replace('\n', ' ')
+                f.write(f"| {item} | {total} | {base} + {seq} + {val} = {total} | {duanyu} | {age} |\n")
+    else:
+        f.write("未找到匹配的本命条文数据\n\n")
+    f.write("## 流年条文 (1-100岁)\n")
+    f.write("| 岁数 | 干支 | 四声 | 标记 | 字母 | 校正数 | 校正后校正数 | 计算公式 | 原条文 | 原断语 | 原断语年龄 | 校正后条文 | 校正后断语 | 校正后断语年龄 |\n")
+    f.write("|------|------|------|------|------|--------|--------------|----------|--------|--------|------------|------------|------------|----------------|\n")
+    for i in [item for item in res['liunian'] if 1 <= item['age'] <= 100]:
+        original_duanyu = i['original_duanyu'].replace('|', '｜').replace('\n', ' ')
+        corrected_duanyu = i['corrected_duanyu'].replace('|', '｜').replace('\n', ' ')
+        f.write(f"| {i['age']} | {i['year']} | {i['sound']} | {i['marker']} | {i['letter']} | "
+                f"{i['original_correction']} | {i['corrected_correction']} | {i['formula']} | "
+                f"{i['original_fortune']} | {original_duanyu} | {i['original_duanyu_age']} | "
+                f"{i['corrected_fortune']} | {corrected_duanyu} | {i['corrected_duanyu_age']} |\n")
+
+def _print_report_linewise(res):
+    """
+    逐列拼接、逐行 print 的旧写法（与旧版 print_report 相同的组织方式），仅作基准对照
+    输出内容与 print(ReportRenderer.render_console(res)) 完全一致
+    """
+    print("\n" + "="*220)
+    print(res['header_info'])
+    print("="*220 + "\n")
+    print("【基础排盘信息】")
+    print(f"{res['cong_calc']}")
+    print(f"五音命数 = {res['tone_num']}")
+    print(f"{res['day_life_calc']}")
+    print(f"{res['moment_calc']}")
+    print(f"{res['main_calc']}")
+    print(f"十二辟卦: {res['hex_name']}")
+    print("\n【本命条文】")
+    if res['tbl_data']:
+        tbl = res['tbl_data']
+        base, seq, offsets = tbl['base'], tbl['seq'], tbl['offsets']
+        print(f"十二辟卦 —— {res['hex_name']}  +{base}")
+        print(f"{res['moment_cn']}生人  先天命数 {res['cong_num']}")
+        print("-" * 60)
+        print(f"{'序数':<6}{'性格':<10}{'才能前程':<10}{'财运':<10}{'兄弟个数':<10}")
+        s_char = ",".join(map(str, offsets['性格']))
+        s_car = ",".join(map(str, offsets['才能前程']))
+        s_wea = ",".join(map(str, offsets['财运']))
+        s_bro = ",".join(map(str, offsets['兄弟个数']))
+        print(f"{seq:<6}{s_char:<10}{s_car:<10}{s_wea:<10}{s_bro:<10}")
+        print("-" * 60)
+        print("\n本命条文详细计算：")
+        texts = {(item, off): (duanyu, age) for item, off, _, duanyu, age in res.get('benming', ())}
+        def print_calc(title, key):
+            for off in offsets[key]:
+                line = f"  {title}: {base} + {seq} + {off} = {base+seq+off}"
+                if (key, off) in texts:
+                    duanyu, age = texts[(key, off)]
+                    line += f"  {duanyu}" + (f"（{age}）" if age else "")
+                print(line)
+        print_calc("(1) 性格", '性格')
+        print_calc("(2) 才能、前程", '才能前程')
+        print_calc("(3) 财运", '财运')
+        print_calc("(4) 兄弟个数", '兄弟个数')
+    else:
+        print(f"  [提示] 未在 14-10 表中找到匹配的条文数据 (卦名: {res['hex_name']}, 刻别: {res['moment_cn']}, 先天数: {res['cong_num']})")
+    print("\n【流年条文 (1-100岁)】")
+    print("=" * 220)
+    header_parts = [
+        f"{'岁数':<6}", f"{'干支':<6}", f"{'四声':<6}", f"{'标记':<6}", f"{'字母':<6}",
+        f"{'校正数':<8}", f"{'校正后校正数':<12}", f"{'计算公式':<10}",
+        f"{'原条文':<8}", f"{'原断语':<30}", f"{'原断语年龄':<10}",
+        f"{'校正后条文':<10}", f"{'校正后断语':<30}", f"{'校正后断语年龄':<10}"
+    ]
+    print("".join(header_parts))
+    print("=" * 220)
+    for i in [item for item in res['liunian'] if 1 <= item['age'] <= 100]:
+        original_duanyu = i['original_duanyu'][:28] + ".." if len(i['original_duanyu']) > 30 else i['original_duanyu']
+        corrected_duanyu = i['corrected_duanyu'][:28] + ".." if len(i['corrected_duanyu']) > 30 else i['corrected_duanyu']
+        row_parts = [
+            f"{i['age']:<6}", f"{i['year']:<6}", f"{i['sound']:<6}", f"{i['marker']:<6}", f"{i['letter']:<6}",
+            f"{i['original_correction']:<8}", f"{i['corrected_correction']:<12}", f"{i['formula']:<10}",
+            f"{i['original_fortune']:<8}", f"{original_duanyu:<30}", f"{i['original_duanyu_age']:<10}",
+            f"{i['corrected_fortune']:<10}", f"{corrected_duanyu:<30}", f"{i['corrected_duanyu_age']:<10}"
+        ]
+        print("".join(row_parts))
+    print("=" * 220)
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - t0
+
+def _chart_lookups_scan(db, gender, y_gan, y_zhi, sum_val, cong_num, main_num):
+    """旧版 calculate 中刻别/卦名/四声序列的逐盘扫描与回退写法，仅作基准对照"""
+    is_yang = is_yang_gan(y_gan)
+    grp = "阳男阴女" if (gender == "男" and is_yang) or (gender == "女" and not is_yang) else "阴男阳女"
+    cond = ">6" if sum_val > 6 else "<=6"
+    moment = "Main"
+    for r in db.rule_tables:
+        if r['组别'] == grp and r['和值条件'] == cond:
+            moment = "Initial" if r['刻别'] == "初刻" else "Main"
+            break
+    moment_cn = "初刻" if moment == "Initial" else "正刻"
+    hex_name = db.HEXAGRAM_DETAIL_MAP.get((moment_cn, main_num), db.HEXAGRAM_MAP.get(main_num, "未知"))
+    bg, sg = liunian_groups(y_gan, y_zhi)
+    start = 0
+    for k in [(cong_num, bg, gender), ('generic', bg, gender)]:
+        if k in db.LIUNIAN_START:
+            start = db.LIUNIAN_START[k]; break
+    final_seq = ["?"] * 12
+    if start != 0:
+        raw_seq = []
+        for k in [(cong_num, y_gan), (cong_num, sg)]:
+            if k in db.LIUNIAN_SEQ:
+                raw_seq = db.LIUNIAN_SEQ[k]; break
+        if raw_seq and len(raw_seq) >= 12:
+            off = (13 - start) % 12
+            final_seq = [raw_seq[(i + off) % 12] for i in range(12)]
+    return moment_cn, hex_name, final_seq
+
+def _chart_lookups_table(db, gender, y_gan, y_zhi, sum_val, cong_num, main_num):
+    """同样的三步，改用加载时预计算的决策表"""
+    moment, moment_cn, grp = db.KEBIE_LOOKUP[(gender, is_yang_gan(y_gan), sum_val > 6)]
+    hex_name = db.HEXAGRAM_LOOKUP.get((moment_cn, main_num), "未知")
+    final_seq = db.LIUNIAN_SEQ_LOOKUP.get((cong_num, y_gan, y_zhi, gender), UNKNOWN_SEQ)
+    return moment_cn, hex_name, final_seq
+
+def _calculate_legacy(calc, payload):
+    """
+    旧版 calculate（预计算决策表之前）：刻别/卦名/四声序列逐盘扫描，流年 108 岁逐岁查表、校正并查断语
+    仅作基准对照，结果字段与当时一致（无 payload/benming）
+    """
+    db = calc.db
+    birth, query, gender = payload['birth_info'], payload['query_info'], payload['gender']
+    y_gan, y_zhi = birth['bazi']['year'][0], birth['bazi']['year'][1]
+    t_zhi = birth['bazi']['time'][1]
+    d_day, t_gan, t_time = birth['bazi']['day'], query['bazi']['time'][0], query['bazi']['time']
+
+    details = {}
+    details['header_info'] = f"性别:{gender}, 农历:{birth['lunar_str']}，闰月{'是' if birth['is_leap'] else '否'}，出生八字：{birth['bazi']['year']} {birth['bazi']['month']} {birth['bazi']['day']} {birth['bazi']['time']}\n求测日期：阳历：{query['date_str']}     八字：{query['bazi']['year']} {query['bazi']['month']} {query['bazi']['day']} {query['bazi']['time']}"
+
+    calc_month = str(m_idx := birth['lunar_month'] + (1 if birth['is_leap'] else 0))
+    if int(m_idx) > 12: calc_month = "1"
+    month_val = db.tables['14-1'].get(calc_month, int(calc_month))
+    time_val = db.tables['14-2'].get(t_zhi, 0)
+    cong_num = month_val + 3 - time_val
+    if cong_num <= 0: cong_num += 12
+    details['cong_calc'] = f"先天命数 = {cong_num}"
+    details['cong_num'] = cong_num
+
+    tone = db.tables.get('14-3', {}).get(cong_num, {}).get(calc.get_gan_group(y_gan), "宫")
+    tone_num = db.tables['14-4'].get(tone, 5)
+    details['tone_num'] = tone_num
+
+    day_life = db.tables.get('14-5', {}).get(NAYIN_WUXING.get(d_day, "金"), {}).get(t_gan, 0)
+    time_luck = db.tables['14-6'].get(NAYIN_WUXING.get(t_time, "金"), 0)
+    details['day_life_calc'] = f"日命:{day_life}, 时运:{time_luck}"
+
+    sum_val = day_life + time_luck
+    is_yang = is_yang_gan(y_gan)
+    grp = "阳男阴女" if (gender == "男" and is_yang) or (gender == "女" and not is_yang) else "阴男阳女"
+    cond = ">6" if sum_val > 6 else "<=6"
+    moment = "Main"
+    for r in db.rule_tables:
+        if r['组别'] == grp and r['和值条件'] == cond:
+            moment = "Initial" if r['刻别'] == "初刻" else "Main"
+            break
+    moment_cn = "初刻" if moment == "Initial" else "正刻"
+    details['moment_calc'] = f"考刻: {moment_cn} ({grp})"
+    details['moment_cn'] = moment_cn
+
+    base_val = tone_num * 5 + day_life + time_luck
+    fact = (base_val - 1) if sum_val <= 6 else (base_val - 6)
+    main_num = fact * 30 + birth['lunar_day']
+    details['main_calc'] = f"本命数: {main_num}"
+    details['main_num'] = main_num
+
+    hex_name = db.HEXAGRAM_DETAIL_MAP.get((moment_cn, main_num),
+                                          db.HEXAGRAM_MAP.get(main_num, f"未知(刻别:{moment_cn},本命数:{main_num}未匹配)"))
+    details['hex_name'] = hex_name
+    details['tbl_data'] = db.DESTINY_DATA.get((hex_name, moment, cong_num))
+
+    pn_sum = cong_num + main_num
+    pn_num = pn_sum % 8
+    if pn_num == 0: pn_num = 8
+    details['pn_log'] = f"先天命数＋本命数＝{cong_num}＋{main_num}＝{pn_sum}÷8→余数＝{pn_num}"
+    details['pn_num'] = pn_num
+
+    liunian = []
+    bg, sg = liunian_groups(y_gan, y_zhi)
+    start = 0
+    for k in [(cong_num, bg, gender), ('generic', bg, gender)]:
+        if k in db.LIUNIAN_START:
+            start = db.LIUNIAN_START[k]; break
+    raw_seq = []
+    final_seq = ["?"] * 12
+    if start != 0:
+        for k in [(cong_num, y_gan), (cong_num, sg)]:
+            if k in db.LIUNIAN_SEQ:
+                raw_seq = db.LIUNIAN_SEQ[k]; break
+        if raw_seq and len(raw_seq) >= 12:
+            off = (13 - start) % 12
+            final_seq = [raw_seq[(i + off) % 12] for i in range(12)]
+    st_tg, st_dz = TIANGAN.index(y_gan), DIZHI.index(y_zhi)
+    for age in range(1, 109):
+        cur_tg = TIANGAN[(st_tg + age - 1) % 10]
+        cur_dz = DIZHI[(st_dz + age - 1) % 12]
+        sound = final_seq[(age - 1) % 12] if final_seq[0] != "?" else "?"
+        marker = db.MARKER_TABLE.get(cur_dz, {}).get(pn_num, "?")
+        letter = db.LETTER_TABLE.get((moment_cn, "奇数" if age % 2 != 0 else "偶数", sound, marker), "?")
+        original_correction = corrected_correction = 0
+        original_fortune = corrected_fortune = formula = corrected_letter = ""
+        if letter != "?" and (letter, age) in db.DATA_BY_LETTER:
+            base, add, original_correction = db.DATA_BY_LETTER[(letter, age)]
+            formula = f"{base}+{add}"
+            original_fortune = str(base + add)
+            corrected_correction = liunian_correction(original_correction, age)
+            if corrected_correction > 0 and (corrected_correction, age) in db.DATA_BY_CORRECTION:
+                corr_base, corr_add = db.DATA_BY_CORRECTION[(corrected_correction, age)]
+                corrected_fortune = str(corr_base + corr_add)
+                corrected_letter = db.CORRECTION_TO_LETTER.get((corrected_correction, age), "?")
+        original_duanyu, original_duanyu_age = db.get_fortune_duanyu(original_fortune)
+        corrected_duanyu, corrected_duanyu_age = db.get_fortune_duanyu(corrected_fortune)
+        liunian.append({
+            "age": age, "year": f"{cur_tg}{cur_dz}", "sound": sound, "marker": marker, "letter": letter,
+            "corrected_letter": corrected_letter,
+            "original_correction": str(original_correction),
+            "corrected_correction": str(corrected_correction),
+            "formula": formula, "original_fortune": original_fortune, "corrected_fortune": corrected_fortune,
+            "original_duanyu": original_duanyu, "original_duanyu_age": original_duanyu_age,
+            "corrected_duanyu": corrected_duanyu, "corrected_duanyu_age": corrected_duanyu_age,
+        })
+    details['liunian'] = liunian
+    return details
+
+def bench_calc(n=2000):
+    """旧版与当前 calculate 的逐盘耗时对比，以及刻别/卦名/四声序列三步查找的扫描写法与决策表写法对比"""
+    calculator = TieBanCalculator()
+    query_info = convert_to_bazi_info(datetime.datetime(2025, 4, 20, 10, 0))
+    payloads = []
+    for gender, dt in zip(["男", "女"] * n, iter_birth_times(1950, 2020)):
+        if len(payloads) >= n:
+            break
+        payloads.append({"birth_info": convert_to_bazi_info(dt), "query_info": query_info, "gender": gender})
+
+    # 先确认新旧写法结果一致，再比较逐盘总耗时
+    for p in payloads:
+        res, old = calculator.calculate(p), _calculate_legacy(calculator, p)
+        if any(res[k] != v for k, v in old.items()):
+            raise TieBanError("决策表写法与旧版 calculate 结果不一致")
+
+    def run_calc(fn):
+        for p in payloads:
+            fn(p)
+    t_calc = min(_timed(run_calc, calculator.calculate) for _ in range(3))
+    t_legacy = min(_timed(run_calc, lambda p: _calculate_legacy(calculator, p)) for _ in range(3))
+
+    args = []
+    for p in payloads:
+        res = calculator.calculate(p)
+        y = p['birth_info']['bazi']['year']
+        args.append((p['gender'], y[0], y[1], res['day_life'] + res['time_luck'], res['cong_num'], res['main_num']))
+
+    def run_lookups(fn):
+        for a in args:
+            fn(calculator.db, *a)
+    t_scan = min(_timed(run_lookups, _chart_lookups_scan) for _ in range(3))
+    t_table = min(_timed(run_lookups, _chart_lookups_table) for _ in range(3))
+
+    print(f"\n【计算基准】{len(payloads)} 盘")
+    print(f"  旧版 calculate:       {t_legacy/len(payloads)*1e6:7.1f} us/盘")
+    print(f"  calculate:            {t_calc/len(payloads)*1e6:7.1f} us/盘  加速 {t_legacy/t_calc:.2f}x")
+    print(f"  刻别/卦名/四声 扫描:   {t_scan/len(payloads)*1e6:7.2f} us/盘")
+    print(f"  刻别/卦名/四声 决策表: {t_table/len(payloads)*1e6:7.2f} us/盘  加速 {t_scan/t_table:.2f}x")
+
+def bench_stress(n=2000, executor="thread", workers=None):
+    """
+    并发压力测试：n 个协程同时通过同一个 TieBanService 排盘，
+    逐一与同步计算结果比对，并验证超时取消后服务仍可正常使用
+    """
+    rng = random.Random(0)
+    requests = []
+    for _ in range(n):
+        birth = datetime.datetime(1900, 1, 1) + datetime.timedelta(minutes=rng.randrange(120 * 365 * 24 * 60))
+        query = datetime.datetime(2000, 1, 1) + datetime.timedelta(minutes=rng.randrange(30 * 365 * 24 * 60))
+        requests.append((rng.choice(["男", "女"]), birth, query))
+
+    with TieBanService(executor=executor, max_workers=workers) as service:
+        expected = [service.chart(*r) for r in requests]
+
+        async def run():
+            t0 = time.perf_counter()
+            results = await asyncio.gather(*(service.achart(*r) for r in requests))
+            elapsed = time.perf_counter() - t0
+            # 极短超时：应抛出 TimeoutError，且不影响后续请求
+            timeouts = 0
+            for r in requests[:20]:
+                try:
+                    await service.achart(*r, timeout=1e-6)
+                except (asyncio.TimeoutError, TimeoutError):
+                    timeouts += 1
+            after = await service.achart(*requests[0])
+            return results, elapsed, timeouts, after
+
+        results, elapsed, timeouts, after = asyncio.run(run())
+
+    mismatches = sum(1 for a, b in zip(results, expected) if a != b)
+    print(f"\n【并发压力测试】{n} 个并发请求，执行器: {executor}")
+    print(f"  耗时 {elapsed:.2f} s，吞吐 {n/elapsed:.0f} 盘/秒")
+    print(f"  与同步结果不一致: {mismatches}")
+    print(f"  极短超时被取消: {timeouts}/20，之后再次请求{'正常' if after == expected[0] else '异常'}")
+    if mismatches or after != expected[0]:
+        raise TieBanError("并发结果与同步结果不一致")
+
+def bench_render(n=500, workers=None):
+    """
+    对比旧写法（逐行 print / 逐行写文件）与当前渲染（预渲染行尾 + 整份缓冲）的耗时，
+    以及串行与进程池批量渲染的耗时；比较前先确认两种写法输出完全一致
+    """
+    calculator = TieBanCalculator()
+    results = _sample_results(calculator, n)
+    renderer = calculator.renderer
+
+    stamp = datetime.datetime(2025, 1, 1)
+    for res in results:
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            _print_report_linewise(res)
+        if buf.getvalue() != renderer.render_console(res) + "\n":
+            raise TieBanError("基准对照写法与 render_console 输出不一致")
+        buf = io.StringIO()
+        _render_markdown_linewise(res, buf, stamp)
+        if buf.getvalue() != renderer.render_markdown(res, stamp):
+            raise TieBanError("基准对照写法与 render_markdown 输出不一致")
+
+    def console_linewise(f):
+        with contextlib.redirect_stdout(f):
+            for res in results:
+                _print_report_linewise(res)
+
+    def console_buffered(f):
+        with contextlib.redirect_stdout(f):
+            for res in results:
+                print(renderer.render_console(res))
+
+    def md_linewise(path):
+        for res in results:
+            with open(path, "w", encoding="utf-8") as f:
+                _render_markdown_linewise(res, f)
+
+    def md_buffered(path):
+        for res in results:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(renderer.render_markdown(res))
+
+    # 各跑 3 轮取最小值，降低噪声；控制台输出写入空设备
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        t_console_old = min(_timed(console_linewise, devnull) for _ in range(3))
+        t_console_new = min(_timed(console_buffered, devnull) for _ in range(3))
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.md")
+        t_md_old = min(_timed(md_linewise, path) for _ in range(3))
+        t_md_new = min(_timed(md_buffered, path) for _ in range(3))
+
+    workers = workers or os.cpu_count() or 1
+    t_serial = _timed(renderer.render_batch, results, "md", 1)
+    t_batch = _timed(renderer.render_batch, results, "md", workers)
+
+    per = lambda t: t / len(results) * 1e6
+    print(f"\n【渲染基准】{len(results)} 份报告（两种写法输出一致）")
+    print(f"  控制台 print_report 旧写法: {per(t_console_old):7.1f} us/份")
+    print(f"  控制台 render_console:      {per(t_console_new):7.1f} us/份  加速 {t_console_old/t_console_new:.2f}x")
+    print(f"  Markdown 逐行写出:          {per(t_md_old):7.1f} us/份")
+    print(f"  Markdown render_markdown:   {per(t_md_new):7.1f} us/份  加速 {t_md_old/t_md_new:.2f}x")
+    print(f"  批量渲染 Markdown(不写文件): 串行 {t_serial*1000:8.1f} ms，{workers} 进程 {t_batch*1000:8.1f} ms")
@@ -2,7 +2,16 @@ import os
 import sys
 import csv
 import datetime
+import hashlib
+import html
+import json
+import tempfile
+import argparse
+import asyncio
+import time
 import traceback
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import pandas as pd
 
 # 尝试导入 cnlunar
@@ -15,6 +24,16 @@ except ImportError:
 # ==============================================================================
 # 0. 全局工具函数
 # ==============================================================================
+class TieBanError(ValueError):
+    """排盘输入无效或计算失败（库接口以异常代替控制台提示）"""
+
+def normalize_zi_hour(dt_obj):
+    """23 点之后为晚子时，按次日早子时排盘"""
+    if dt_obj.hour >= 23:
+        dt = dt_obj + datetime.timedelta(days=1)
+        return datetime.datetime(dt.year, dt.month, dt.day, 0, dt_obj.minute)
+    return dt_obj
+
 def input_datetime(desc_str):
     """处理用户输入的日期时间"""
     while True:
@@ -27,16 +46,15 @@ def input_datetime(desc_str):
             date_str, time_str = parts
             year, month, day = map(int, date_str.split('-'))
             hour, minute = map(int, time_str.split(':'))
+            dt = datetime.datetime(year, month, day, min(hour, 23), minute)
             if hour >= 23:
                 print(f"  [提示] {hour}:{minute} 为晚子时，系统已自动按次日早子时排盘。")
-                dt = datetime.datetime(year, month, day) + datetime.timedelta(days=1)
-                return datetime.datetime(dt.year, dt.month, dt.day, 0, minute)
-            return datetime.datetime(year, month, day, hour, minute)
+            return normalize_zi_hour(dt)
         except ValueError:
             print("输入无效，请重新输入 (示例: 1951-10-14 18:00)")
 
-def convert_to_bazi_info(dt_obj):
-    """将公历转为八字信息"""
+def bazi_info(dt_obj):
+    """将公历转为八字信息，失败时抛出 TieBanError"""
     try:
         a = cnlunar.Lunar(dt_obj, godType='8char')
         try: lm, ld = int(a.lunarMonth), int(a.lunarDay)
@@ -48,7 +66,14 @@ def convert_to_bazi_info(dt_obj):
             "lunar_str": f"{a.lunarYearCn}年 {a.lunarMonthCn}{a.lunarDayCn}"
         }
     except Exception as e:
-        print(f"八字转换失败: {e}")
+        raise TieBanError(f"八字转换失败: {e}") from e
+
+def convert_to_bazi_info(dt_obj):
+    """将公历转为八字信息（命令行用：失败时打印原因并返回 None）"""
+    try:
+        return bazi_info(dt_obj)
+    except TieBanError as e:
+        print(e)
         return None
 
 # ==============================================================================
@@ -77,12 +102,57 @@ def build_correction_map():
     for c in "等亶旦刀西萨訾省": LETTER_CORRECTION_MAP[c] = 6
 build_correction_map()
 
+TIANGAN = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
+DIZHI = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+UNKNOWN_SEQ = ("?",) * 12
+
+def liunian_groups(year_gan, year_zhi):
+    """年支三合组、年干组"""
+    b_group = "未知"
+    if year_zhi in "寅午戌": b_group = "寅午戌"
+    elif year_zhi in "申子辰": b_group = "申子辰"
+    elif year_zhi in "巳酉丑": b_group = "巳酉丑"
+    elif year_zhi in "亥卯未": b_group = "亥卯未"
+    s_group = "未知"
+    if year_gan in "甲乙丙丁": s_group = "甲乙丙丁"
+    elif year_gan in "戊己": s_group = "戊己"
+    elif year_gan in "庚辛": s_group = "庚辛"
+    elif year_gan in "壬癸": s_group = "壬癸"
+    return b_group, s_group
+
+def is_yang_gan(gan):
+    return gan in ["甲", "丙", "戊", "庚", "壬"]
+
+def liunian_correction(original_correction, age):
+    """
+    根据年龄计算校正后的条文校正数
+    规则：
+    1. 1-10岁/81-108岁：校正数+2（>6则-6）
+    2. 其他年龄：校正数+3（>20则-20）
+    """
+    if original_correction == 0:
+        return 0
+        
+    # 情况一：1-10岁 或 81-108岁
+    if (1 <= age <= 10) or (81 <= age <= 108):
+        new_correction = original_correction + 2
+        if new_correction > 6:
+            new_correction -= 6
+    # 情况二：其他年龄
+    else:
+        new_correction = original_correction + 3
+        if new_correction > 20:
+            new_correction -= 20
+            
+    return new_correction
+
 # ==============================================================================
 # 2. 数据加载器
 # ==============================================================================
 class TieBanDataLoader:
-    def __init__(self, db_folder="./数据库"):
+    def __init__(self, db_folder="./数据库", verbose=True):
         self.db_folder = db_folder
+        self.verbose = verbose              # False 时静默加载（库调用），不向控制台输出
         self.tables = {} 
         self.rule_tables = []
         
@@ -106,11 +176,26 @@ class TieBanDataLoader:
         self.FORTUNE_DUANYU_MAP = {}    # 条文数字 -> (断语, 对应年龄)
         self.FORTUNE_DUANYU_RAW = []    # 原始断词数据
         
-        print(f">>> 正在加载数据库 ({os.path.abspath(db_folder)})...")
+        # 预计算决策表：把 calculate 中每盘都要重复的规则扫描、多级回退查找展开为直接索引
+        self.KEBIE_LOOKUP = {}          # (性别, 是否阳年, 和值>6) -> (moment, 刻别, 组别)
+        self.HEXAGRAM_LOOKUP = {}       # (刻别, 本命数) -> 卦名（已合并按本命数的回退）
+        self.LIUNIAN_SEQ_LOOKUP = {}    # (先天命数, 年干, 年支, 性别) -> 旋转后的12位四声序列
+        self.MARKER_LOOKUP = {}         # (流年地支, 后天命数) -> 流年标记
+        self.BENMING_TEXT = {}          # (卦名, moment, 先天命数) -> [[项目, 加数, 条文数, 断语, 断语年龄], ...]
+        self.LIUNIAN_ROWS = {}          # (流年字母, 岁数) -> 该岁流年行中只依赖这两者的字段
+        self.EMPTY_LIUNIAN_ROW = {}     # 字母未匹配时的流年字段
+        self.LIUNIAN_TAILS = {}         # 报告格式 -> {(流年字母, 岁数) -> 预渲染的行尾}
+        self.EMPTY_LIUNIAN_TAIL = {}    # 报告格式 -> 字母未匹配时的行尾
+        
+        self._log(f">>> 正在加载数据库 ({os.path.abspath(db_folder)})...")
         if os.path.exists(db_folder):
             self._load_all()
         else:
-            print("【错误】数据库文件夹不存在！")
+            self._log("【错误】数据库文件夹不存在！")
+
+    def _log(self, msg):
+        if self.verbose:
+            print(msg)
 
     def _read_csv_robust(self, filename, header_option=0):
         """健壮的读取函数，自动尝试多种编码"""
@@ -166,7 +251,7 @@ class TieBanDataLoader:
         df_14_9 = self._read_csv_robust("14-9.csv", header_option=None)
         if df_14_9 is not None and not df_14_9.empty:
             col_count = len(df_14_9.columns)
-            print(f"  > 加载 14-9.csv 成功，共 {len(df_14_9)} 条数据，列数：{col_count}")
+            self._log(f"  > 加载 14-9.csv 成功，共 {len(df_14_9)} 条数据，列数：{col_count}")
             
             if col_count >= 3:
                 invalid_rows = 0
@@ -179,7 +264,7 @@ class TieBanDataLoader:
                         if kebie not in ["初刻", "正刻"]:
                             invalid_rows += 1
                             if invalid_rows <= 3:
-                                print(f"    提示: 第 {idx+1} 行刻别无效 ({kebie})，已跳过")
+                                self._log(f"    提示: 第 {idx+1} 行刻别无效 ({kebie})，已跳过")
                             continue
                         
                         # 第二列：本命数
@@ -187,7 +272,7 @@ class TieBanDataLoader:
                         if not self._is_numeric(benming_num):
                             invalid_rows += 1
                             if invalid_rows <= 3:
-                                print(f"    提示: 第 {idx+1} 行本命数非数值 ({benming_num})，已跳过")
+                                self._log(f"    提示: 第 {idx+1} 行本命数非数值 ({benming_num})，已跳过")
                             continue
                         num = int(float(benming_num))
                         
@@ -196,7 +281,7 @@ class TieBanDataLoader:
                         if not hex_name or hex_name == 'nan':
                             invalid_rows += 1
                             if invalid_rows <= 3:
-                                print(f"    提示: 第 {idx+1} 行卦名为空，已跳过")
+                                self._log(f"    提示: 第 {idx+1} 行卦名为空，已跳过")
                             continue
                         
                         # 构建映射
@@ -206,46 +291,45 @@ class TieBanDataLoader:
                         
                         valid_rows += 1
                         if valid_rows <= 10:
-                            print(f"    调试: {kebie} {num} -> {hex_name}")
+                            self._log(f"    调试: {kebie} {num} -> {hex_name}")
                             
                     except Exception as e:
                         invalid_rows += 1
                         continue
                 
-                print(f"  > 14-9.csv 解析完成：有效行数 {valid_rows}，无效行数 {invalid_rows}")
-                print(f"  > 成功解析 {len(self.HEXAGRAM_DETAIL_MAP)} 条详细卦象数据")
+                self._log(f"  > 14-9.csv 解析完成：有效行数 {valid_rows}，无效行数 {invalid_rows}")
+                self._log(f"  > 成功解析 {len(self.HEXAGRAM_DETAIL_MAP)} 条详细卦象数据")
                 if len(self.HEXAGRAM_DETAIL_MAP) == 0:
-                    print("  [警告] 14-9.csv 中未找到有效卦象数据！")
+                    self._log("  [警告] 14-9.csv 中未找到有效卦象数据！")
         else:
-            print("  [警告] 无法读取 14-9.csv，请检查文件是否存在！")
+            self._log("  [警告] 无法读取 14-9.csv，请检查文件是否存在！")
 
-        # 14-10: 卦象详情
+        # 14-10: 卦象详情（兼容 卦名/十二辟卦、初刻先天/初刻生人先天命数 等列名；多个数值以 | ， 或换行分隔）
         for r in self._read_csv_as_dicts("14-10.csv"):
             try:
-                gua = r['卦名']
+                gua = self._clean_key(r.get('卦名', r.get('十二辟卦')))
                 base = int(r['基数'])
                 seq = int(r['序数'])
-                def parse_offsets(s): 
-                    return [int(x) for x in str(s).replace('，','|').split('|') if x.strip().isdigit()]
+                def split_nums(s):
+                    return [int(x) for x in str(s).replace('，','|').replace('\n','|').split('|') if x.strip().isdigit()]
                 offsets = {
-                    "性格": parse_offsets(r['性格']),
-                    "才能前程": parse_offsets(r['才能前程']),
-                    "财运": parse_offsets(r['财运']),
-                    "兄弟个数": parse_offsets(r['兄弟个数'])
+                    "性格": split_nums(r['性格']),
+                    "才能前程": split_nums(r['才能前程']),
+                    "财运": split_nums(r['财运']),
+                    "兄弟个数": split_nums(r['兄弟个数'])
                 }
                 data_pack = {"base": base, "seq": seq, "offsets": offsets}
                 
                 # 初刻
-                if r.get('初刻先天'):
-                    for n in str(r['初刻先天']).split('|'):
-                        if n.strip().isdigit():
-                            self.DESTINY_DATA[(gua, "Initial", int(n))] = data_pack
+                key_init = next((k for k in ['初刻先天', '初刻生人先天命数', '初刻'] if k in r), None)
+                if key_init and r.get(key_init):
+                    for n in split_nums(r[key_init]):
+                        self.DESTINY_DATA[(gua, "Initial", n)] = data_pack
                 # 正刻
-                key_main = '正刻先天' if '正刻先天' in r else '正刻'
-                if r.get(key_main):
-                    for n in str(r[key_main]).split('|'):
-                        if n.strip().isdigit():
-                            self.DESTINY_DATA[(gua, "Main", int(n))] = data_pack
+                key_main = next((k for k in ['正刻先天', '正刻生人先天命数', '正刻'] if k in r), None)
+                if key_main and r.get(key_main):
+                    for n in split_nums(r[key_main]):
+                        self.DESTINY_DATA[(gua, "Main", n)] = data_pack
             except Exception: pass
             
         # 3. 流年相关 (14-11 ~ 14-14)
@@ -290,11 +374,11 @@ class TieBanDataLoader:
         # 14-14 流年条文表
         df_14_14 = self._read_csv_robust("14-14.csv", header_option=0)
         if df_14_14 is not None and not df_14_14.empty:
-            print(f"  > 加载 14-14.csv 成功，共 {len(df_14_14)} 条数据")
+            self._log(f"  > 加载 14-14.csv 成功，共 {len(df_14_14)} 条数据")
             
             # 获取列名并清洗
             columns = [self._clean_key(col) for col in df_14_14.columns]
-            print(f"    14-14.csv 列名: {columns}")
+            self._log(f"    14-14.csv 列名: {columns}")
             
             # 查找关键列的索引
             col_mapping = {}
@@ -314,7 +398,7 @@ class TieBanDataLoader:
             required_cols = ['letter', 'age', 'base', 'add', 'correction']
             missing_cols = [col for col in required_cols if col not in col_mapping]
             if missing_cols:
-                print(f"    [警告] 14-14.csv 缺少必要列: {missing_cols}")
+                self._log(f"    [警告] 14-14.csv 缺少必要列: {missing_cols}")
             else:
                 # 读取数据
                 for idx, row in df_14_14.iterrows():
@@ -336,19 +420,19 @@ class TieBanDataLoader:
                     except Exception as e:
                         continue
                 
-                print(f"    成功加载 {len(self.DATA_BY_LETTER)} 条流年条文数据")
+                self._log(f"    成功加载 {len(self.DATA_BY_LETTER)} 条流年条文数据")
         else:
-            print("  [警告] 无法读取 14-14.csv，请检查文件是否存在！")
+            self._log("  [警告] 无法读取 14-14.csv，请检查文件是否存在！")
         
         # 新增：加载铁板神数-条文断词.csv
         duanyu_file = "铁板神数-条文断词.csv"
         df_duanyu = self._read_csv_robust(duanyu_file, header_option=0)
         if df_duanyu is not None and not df_duanyu.empty:
-            print(f"  > 加载 {duanyu_file} 成功，共 {len(df_duanyu)} 条数据")
+            self._log(f"  > 加载 {duanyu_file} 成功，共 {len(df_duanyu)} 条数据")
             
             # 获取列名并清洗
             columns = [self._clean_key(col) for col in df_duanyu.columns]
-            print(f"    {duanyu_file} 列名: {columns}")
+            self._log(f"    {duanyu_file} 列名: {columns}")
             
             # 查找关键列的索引
             col_mapping = {}
@@ -397,79 +481,169 @@ class TieBanDataLoader:
                 except Exception as e:
                     continue
             
-            print(f"    成功加载 {valid_count} 条条文断语数据")
+            self._log(f"    成功加载 {valid_count} 条条文断语数据")
             if valid_count > 0:
                 # 打印前5条作为示例
-                print(f"    示例数据: {list(self.FORTUNE_DUANYU_MAP.items())[:5]}")
+                self._log(f"    示例数据: {list(self.FORTUNE_DUANYU_MAP.items())[:5]}")
         else:
-            print(f"  [警告] 无法读取 {duanyu_file}，断语功能将不可用！")
+            self._log(f"  [警告] 无法读取 {duanyu_file}，断语功能将不可用！")
+
+        self._build_decision_tables()
+
+    def _build_decision_tables(self):
+        # 刻别 (14-7)：规则表只有 组别 × 和值条件 四种组合，按性别与年干阴阳展开
+        for gender in ["男", "女"]:
+            for is_yang in [True, False]:
+                grp = "阳男阴女" if (gender == "男" and is_yang) or (gender == "女" and not is_yang) else "阴男阳女"
+                for gt6 in [True, False]:
+                    cond = ">6" if gt6 else "<=6"
+                    moment = "Main"
+                    for r in self.rule_tables:
+                        if r['组别'] == grp and r['和值条件'] == cond:
+                            moment = "Initial" if r['刻别'] == "初刻" else "Main"
+                            break
+                    moment_cn = "初刻" if moment == "Initial" else "正刻"
+                    self.KEBIE_LOOKUP[(gender, is_yang, gt6)] = (moment, moment_cn, grp)
+
+        # 卦名 (14-9)：先按 (刻别, 本命数)，找不到再按本命数
+        for num, hex_name in self.HEXAGRAM_MAP.items():
+            for moment_cn in ["初刻", "正刻"]:
+                self.HEXAGRAM_LOOKUP[(moment_cn, num)] = self.HEXAGRAM_DETAIL_MAP.get((moment_cn, num), hex_name)
+
+        # 流年四声 (14-11)：起始数按 (先天命数|generic, 年支组, 性别) 回退，序列按 (先天命数, 年干|年干组) 回退
+        for cong_num in sorted({k[0] for k in self.LIUNIAN_SEQ}):
+            for y_gan in TIANGAN:
+                for y_zhi in DIZHI:
+                    bg, sg = liunian_groups(y_gan, y_zhi)
+                    for gender in ["男", "女"]:
+                        start = 0
+                        for k in [(cong_num, bg, gender), ('generic', bg, gender)]:
+                            if k in self.LIUNIAN_START:
+                                start = self.LIUNIAN_START[k]; break
+                        if start == 0:
+                            continue
+                        raw_seq = []
+                        for k in [(cong_num, y_gan), (cong_num, sg)]:
+                            if k in self.LIUNIAN_SEQ:
+                                raw_seq = self.LIUNIAN_SEQ[k]; break
+                        if raw_seq and len(raw_seq) >= 12:
+                            off = (13 - start) % 12
+                            self.LIUNIAN_SEQ_LOOKUP[(cong_num, y_gan, y_zhi, gender)] = tuple(raw_seq[(i + off) % 12] for i in range(12))
+
+        # 流年标记 (14-12)
+        for zhi, by_num in self.MARKER_TABLE.items():
+            for num, marker in by_num.items():
+                self.MARKER_LOOKUP[(zhi, num)] = marker
+
+        # 本命条文 (14-10)：全部 基数+序数+加数 一次性对照断语表，按 (卦名, 刻别, 先天命数) 存储
+        # 行用列表而非元组：结果经 JSON 缓存往返后结构不变，diff_charts 不会误报差异
+        nums = {p['base'] + p['seq'] + off for p in self.DESTINY_DATA.values()
+                for values in p['offsets'].values() for off in values}
+        texts = {n: self.FORTUNE_DUANYU_MAP.get(n, ("未找到断语", "未知")) for n in nums}
+        for key, p in self.DESTINY_DATA.items():
+            rows = []
+            for item, values in p['offsets'].items():
+                for off in values:
+                    num = p['base'] + p['seq'] + off
+                    rows.append([item, off, num, *texts[num]])
+            self.BENMING_TEXT[key] = rows
+        self._log(f"  > 本命条文断语预解析完成：{len(self.BENMING_TEXT)} 组，{len(nums)} 个条文数")
+
+        # 流年条文 (14-14)：条文、校正后条文及断语只取决于 (流年字母, 岁数)，逐键预先算好
+        self.LIUNIAN_ROWS = {key: self._liunian_row_fields(*key) for key in self.DATA_BY_LETTER}
+        self.EMPTY_LIUNIAN_ROW = self._liunian_row_fields("?", 0)
+        # 流年行中 字母 之后的各列同样只取决于 (流年字母, 岁数)：按报告格式各预渲染一次，出报告时直接拼接
+        tail = ReportRenderer.liunian_tail
+        for fmt in ReportRenderer.FORMATS:
+            self.LIUNIAN_TAILS[fmt] = {key: tail(row, fmt) for key, row in self.LIUNIAN_ROWS.items()}
+            self.EMPTY_LIUNIAN_TAIL[fmt] = tail(self.EMPTY_LIUNIAN_ROW, fmt)
+
+    def get_fortune_duanyu(self, fortune_num):
+        """
+        根据条文数字获取对应的断语和年龄
+        返回：(断语, 对应年龄)
+        """
+        if not fortune_num or fortune_num == "" or not self._is_numeric(fortune_num):
+            return ("", "")
+        
+        try:
+            num = int(float(fortune_num))
+            return self.FORTUNE_DUANYU_MAP.get(num, ("未找到断语", "未知"))
+        except:
+            return ("", "")
+
+    def _liunian_row_fields(self, letter, age):
+        """(流年字母, 岁数) 决定的流年字段：条文、校正后条文及其断语"""
+        corrected_letter = ""     # 校正后的字母
+        original_correction = 0   # 原始条文校正数
+        corrected_correction = 0  # 校正后的条文校正数
+        formula = ""
+        original_fortune = ""     # 原始条文数
+        corrected_fortune = ""    # 校正后的条文数
+        
+        # 查找原始数据
+        if letter != "?" and (letter, age) in self.DATA_BY_LETTER:
+            base, add, original_correction = self.DATA_BY_LETTER[(letter, age)]
+            formula = f"{base}+{add}"
+            original_fortune = str(base + add)
+            
+            # 计算校正后的条文校正数
+            corrected_correction = liunian_correction(original_correction, age)
+            
+            # 根据新的校正数查找校正后的条文
+            if corrected_correction > 0 and (corrected_correction, age) in self.DATA_BY_CORRECTION:
+                corr_base, corr_add = self.DATA_BY_CORRECTION[(corrected_correction, age)]
+                corrected_fortune = str(corr_base + corr_add)
+                # 查找校正后的字母（可选）
+                corrected_letter = self.CORRECTION_TO_LETTER.get((corrected_correction, age), "?")
+        
+        # 断语信息
+        original_duanyu, original_duanyu_age = self.get_fortune_duanyu(original_fortune)
+        corrected_duanyu, corrected_duanyu_age = self.get_fortune_duanyu(corrected_fortune)
+        
+        return {
+            "corrected_letter": corrected_letter,
+            "original_correction": str(original_correction),
+            "corrected_correction": str(corrected_correction),
+            "formula": formula, 
+            "original_fortune": original_fortune,
+            "corrected_fortune": corrected_fortune,
+            "original_duanyu": original_duanyu,          # 原始条文断语
+            "original_duanyu_age": original_duanyu_age,  # 原始条文对应年龄
+            "corrected_duanyu": corrected_duanyu,        # 校正后条文断语
+            "corrected_duanyu_age": corrected_duanyu_age # 校正后条文对应年龄
+        }
 
 # ==============================================================================
 # 3. Calculator
 # ==============================================================================
 class TieBanCalculator:
-    def __init__(self):
-        self.loader = TieBanDataLoader()
+    def __init__(self, loader=None, strict=False):
+        # 可传入已加载的 loader 以便多个计算器共享同一份只读数据
+        self.loader = loader if loader is not None else TieBanDataLoader()
         self.db = self.loader
-        self.tiangan = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
-        self.dizhi = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+        self.strict = strict                # True 时流年计算出错直接抛出 TieBanError（库调用），否则打印后继续
+        self.renderer = ReportRenderer(self.loader)
+        self.tiangan = TIANGAN
+        self.dizhi = DIZHI
 
     def get_gan_group(self, gan):
         if gan not in self.tiangan: return "甲己"
         return ["甲己", "乙庚", "丙辛", "丁壬", "戊癸"][self.tiangan.index(gan) % 5]
 
     def get_liunian_groups(self, year_gan, year_zhi):
-        b_group = "未知"
-        if year_zhi in "寅午戌": b_group = "寅午戌"
-        elif year_zhi in "申子辰": b_group = "申子辰"
-        elif year_zhi in "巳酉丑": b_group = "巳酉丑"
-        elif year_zhi in "亥卯未": b_group = "亥卯未"
-        s_group = "未知"
-        if year_gan in "甲乙丙丁": s_group = "甲乙丙丁"
-        elif year_gan in "戊己": s_group = "戊己"
-        elif year_gan in "庚辛": s_group = "庚辛"
-        elif year_gan in "壬癸": s_group = "壬癸"
-        return b_group, s_group
+        return liunian_groups(year_gan, year_zhi)
 
     def is_yang_year(self, year_gan):
-        return year_gan in ["甲", "丙", "戊", "庚", "壬"]
+        return is_yang_gan(year_gan)
     
     def calculate_correction(self, original_correction, age):
-        """
-        根据年龄计算校正后的条文校正数
-        规则：
-        1. 1-10岁/81-108岁：校正数+2（>6则-6）
-        2. 其他年龄：校正数+3（>20则-20）
-        """
-        if original_correction == 0:
-            return 0
-            
-        # 情况一：1-10岁 或 81-108岁
-        if (1 <= age <= 10) or (81 <= age <= 108):
-            new_correction = original_correction + 2
-            if new_correction > 6:
-                new_correction -= 6
-        # 情况二：其他年龄
-        else:
-            new_correction = original_correction + 3
-            if new_correction > 20:
-                new_correction -= 20
-                
-        return new_correction
+        """根据年龄计算校正后的条文校正数，规则见 liunian_correction"""
+        return liunian_correction(original_correction, age)
     
     def get_fortune_duanyu(self, fortune_num):
-        """
-        根据条文数字获取对应的断语和年龄
-        返回：(断语, 对应年龄)
-        """
-        if not fortune_num or fortune_num == "" or not self._is_numeric(fortune_num):
-            return ("", "")
-        
-        try:
-            num = int(float(fortune_num))
-            return self.db.FORTUNE_DUANYU_MAP.get(num, ("未找到断语", "未知"))
-        except:
-            return ("", "")
+        """根据条文数字获取对应的断语和年龄，返回：(断语, 对应年龄)"""
+        return self.db.get_fortune_duanyu(fortune_num)
     
     def _is_numeric(self, value):
         """判断值是否可以转换为数字"""
@@ -481,15 +655,69 @@ class TieBanCalculator:
         except (ValueError, TypeError):
             return False
 
+    # 各步骤及其依赖：birth/query/gender 为输入，其余为前序步骤写入结果的字段
+    # recalculate 据此只重算依赖发生变化的步骤
+    STEPS = [
+        ("_step_header",   ("birth", "query", "gender")),
+        ("_step_cong",     ("birth",)),
+        ("_step_day_time", ("birth", "query")),
+        ("_step_moment",   ("birth", "gender", "day_life", "time_luck")),
+        ("_step_main",     ("birth", "tone_num", "day_life", "time_luck")),
+        ("_step_hex",      ("moment_cn", "main_num", "cong_num")),
+        ("_step_pn",       ("cong_num", "main_num")),
+        ("_step_liunian",  ("birth", "gender", "cong_num", "moment_cn", "pn_num")),
+    ]
+    # 被后续步骤依赖的中间结果：只有这些字段需要在重算后比对是否变化
+    STEP_OUTPUTS = {dep for _, deps in STEPS for dep in deps} - {"birth", "query", "gender"}
+
     def calculate(self, payload):
         birth, query, gender = payload['birth_info'], payload['query_info'], payload['gender']
-        y_gan, y_zhi = birth['bazi']['year'][0], birth['bazi']['year'][1]
-        t_zhi = birth['bazi']['time'][1]
-        d_day, t_gan, t_time = birth['bazi']['day'], query['bazi']['time'][0], query['bazi']['time']
-        
-        details = {}
+        self._check_gender(gender)
+        details = {"payload": {"birth_info": birth, "query_info": query, "gender": gender}}
+        for name, _ in self.STEPS:
+            getattr(self, name)(details, birth, query, gender)
+        return details
+
+    def recalculate(self, prev, gender=None, query_info=None):
+        """
+        在已有排盘结果上修改性别或求测时间，只重算受影响的步骤
+        例如只改性别时，先天命数、五音命数、本命数等沿用原结果，仅重算刻别、卦名与流年
+        未受影响的字段（包括流年列表）与 prev 共享同一对象，调用方勿原地修改
+        """
+        old = prev['payload']
+        birth = old['birth_info']
+        query = old['query_info'] if query_info is None else query_info
+        gender = old['gender'] if gender is None else gender
+        self._check_gender(gender)
+
+        changed = set()
+        if gender != old['gender']:
+            changed.add("gender")
+        if query != old['query_info']:
+            changed.add("query")
+
+        details = dict(prev)
+        details['payload'] = {"birth_info": birth, "query_info": query, "gender": gender}
+        for name, deps in self.STEPS:
+            if changed.isdisjoint(deps):
+                continue
+            before = {k: details.get(k) for k in self.STEP_OUTPUTS}
+            getattr(self, name)(details, birth, query, gender)
+            changed.update(k for k, v in before.items() if details.get(k) != v)
+        return details
+
+    @staticmethod
+    def _check_gender(gender):
+        # 刻别决策表只有 男/女 两种键，其他取值在此明确报错而非查表时抛出 KeyError
+        if gender not in ("男", "女"):
+            raise TieBanError(f"性别无效: {gender!r}，应为 '男' 或 '女'")
+
+    def _step_header(self, details, birth, query, gender):
         details['header_info'] = f"性别:{gender}, 农历:{birth['lunar_str']}，闰月{'是' if birth['is_leap'] else '否'}，出生八字：{birth['bazi']['year']} {birth['bazi']['month']} {birth['bazi']['day']} {birth['bazi']['time']}\n求测日期：阳历：{query['date_str']}     八字：{query['bazi']['year']} {query['bazi']['month']} {query['bazi']['day']} {query['bazi']['time']}"
 
+    def _step_cong(self, details, birth, query, gender):
+        y_gan, t_zhi = birth['bazi']['year'][0], birth['bazi']['time'][1]
+
         # Step 1: 计算先天命数
         calc_month = str(m_idx := birth['lunar_month'] + (1 if birth['is_leap'] else 0))
         if int(m_idx) > 12: calc_month = "1"
@@ -506,43 +734,56 @@ class TieBanCalculator:
         tone_num = self.db.tables['14-4'].get(tone, 5)
         details['tone_num'] = tone_num
 
+    def _step_day_time(self, details, birth, query, gender):
+        d_day, t_gan, t_time = birth['bazi']['day'], query['bazi']['time'][0], query['bazi']['time']
+
         # Step 3: 计算日命数和时运数
         day_n = NAYIN_WUXING.get(d_day, "金")
         day_life = self.db.tables.get('14-5', {}).get(day_n, {}).get(t_gan, 0)
         time_n = NAYIN_WUXING.get(t_time, "金")
         time_luck = self.db.tables['14-6'].get(time_n, 0)
         details['day_life_calc'] = f"日命:{day_life}, 时运:{time_luck}"
+        details['day_life'] = day_life
+        details['time_luck'] = time_luck
 
+    def _step_moment(self, details, birth, query, gender):
         # Step 4: 确定刻别（初刻/正刻）
-        sum_val = day_life + time_luck
-        is_yang = self.is_yang_year(y_gan)
-        grp = "阳男阴女" if (gender == "男" and is_yang) or (gender == "女" and not is_yang) else "阴男阳女"
-        cond = ">6" if sum_val > 6 else "<=6"
-        moment = "Main"
-        for r in self.db.rule_tables:
-            if r['组别'] == grp and r['和值条件'] == cond:
-                moment = "Initial" if r['刻别'] == "初刻" else "Main"
-                break
-        moment_cn = "初刻" if moment == "Initial" else "正刻"
+        sum_val = details['day_life'] + details['time_luck']
+        moment, moment_cn, grp = self.db.KEBIE_LOOKUP[(gender, is_yang_gan(birth['bazi']['year'][0]), sum_val > 6)]
         details['moment_calc'] = f"考刻: {moment_cn} ({grp})"
         details['moment_cn'] = moment_cn
 
+    def _step_main(self, details, birth, query, gender):
         # Step 5: 计算本命数
-        base_val = tone_num * 5 + day_life + time_luck
+        sum_val = details['day_life'] + details['time_luck']
+        base_val = details['tone_num'] * 5 + sum_val
         fact = (base_val - 1) if sum_val <= 6 else (base_val - 6)
         main_num = fact * 30 + birth['lunar_day']
         details['main_calc'] = f"本命数: {main_num}"
         details['main_num'] = main_num
 
+    def _step_hex(self, details, birth, query, gender):
+        moment_cn, main_num, cong_num = details['moment_cn'], details['main_num'], details['cong_num']
+        moment = "Initial" if moment_cn == "初刻" else "Main"
+
         # Step 6: 查找卦名
-        hex_name = self.db.HEXAGRAM_DETAIL_MAP.get((moment_cn, main_num), 
-                                                  self.db.HEXAGRAM_MAP.get(main_num, 
-                                                                          f"未知(刻别:{moment_cn},本命数:{main_num}未匹配)"))
+        hex_name = self.db.HEXAGRAM_LOOKUP.get((moment_cn, main_num))
+        if hex_name is None:
+            hex_name = f"未知(刻别:{moment_cn},本命数:{main_num}未匹配)"
         details['hex_name'] = hex_name
         
         # 查找详细数据
         tbl_data = self.db.DESTINY_DATA.get((hex_name, moment, cong_num))
+        if tbl_data:
+            # 复制一份，避免调用方修改结果时改动共享的数据库表
+            tbl_data = {"base": tbl_data['base'], "seq": tbl_data['seq'],
+                        "offsets": {k: list(v) for k, v in tbl_data['offsets'].items()}}
         details['tbl_data'] = tbl_data
+        # 本命条文及断语（加载时已预解析），同样复制一份
+        details['benming'] = [list(r) for r in self.db.BENMING_TEXT.get((hex_name, moment, cong_num), ())]
+
+    def _step_pn(self, details, birth, query, gender):
+        cong_num, main_num = details['cong_num'], details['main_num']
 
         # Step 7: 计算后天命数
         pn_sum = cong_num + main_num
@@ -551,217 +792,718 @@ class TieBanCalculator:
         details['pn_log'] = f"先天命数＋本命数＝{cong_num}＋{main_num}＝{pn_sum}÷8→余数＝{pn_num}"
         details['pn_num'] = pn_num
 
+    def _step_liunian(self, details, birth, query, gender):
+        y_gan, y_zhi = birth['bazi']['year'][0], birth['bazi']['year'][1]
+        cong_num, moment_cn, pn_num = details['cong_num'], details['moment_cn'], details['pn_num']
+
         # Step 8: 计算流年条文（核心修改）
         liunian = []
         try:
-            bg, sg = self.get_liunian_groups(y_gan, y_zhi)
-            start = 0
-            for k in [(cong_num, bg, gender), ('generic', bg, gender)]:
-                if k in self.db.LIUNIAN_START:
-                    start = self.db.LIUNIAN_START[k]; break
-            raw_seq = []
-            final_seq = ["?"] * 12
-            if start != 0:
-                for k in [(cong_num, y_gan), (cong_num, sg)]:
-                    if k in self.db.LIUNIAN_SEQ:
-                        raw_seq = self.db.LIUNIAN_SEQ[k]; break
-                if raw_seq and len(raw_seq) >= 12:
-                    off = (13 - start) % 12
-                    final_seq = [raw_seq[(i + off) % 12] for i in range(12)]
-
-            tg_list = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
-            dz_list = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
-            st_tg = tg_list.index(y_gan)
-            st_dz = dz_list.index(y_zhi)
+            final_seq = self.db.LIUNIAN_SEQ_LOOKUP.get((cong_num, y_gan, y_zhi, gender), UNKNOWN_SEQ)
+            st_tg = TIANGAN.index(y_gan)
+            st_dz = DIZHI.index(y_zhi)
+            marker_lookup, letter_table = self.db.MARKER_LOOKUP, self.db.LETTER_TABLE
+            rows, empty_row = self.db.LIUNIAN_ROWS, self.db.EMPTY_LIUNIAN_ROW
             
             # 生成1-108岁的流年数据（覆盖81-108岁的校正需求）
             for age in range(1, 109):
-                cur_tg = tg_list[(st_tg + age - 1) % 10]
-                cur_dz = dz_list[(st_dz + age - 1) % 12]
-                sound = final_seq[(age - 1) % 12] if final_seq[0] != "?" else "?"
-                marker = self.db.MARKER_TABLE.get(cur_dz, {}).get(pn_num, "?")
-                
-                age_parity = "奇数" if age % 2 != 0 else "偶数"
-                letter = self.db.LETTER_TABLE.get((moment_cn, age_parity, sound, marker), "?")
-
-                # 初始化变量
-                base = 0
-                add = 0
-                original_correction = 0  # 原始条文校正数
-                corrected_correction = 0  # 校正后的条文校正数
-                original_fortune = ""     # 原始条文数
-                corrected_fortune = ""    # 校正后的条文数
-                formula = ""
-                corrected_letter = ""     # 校正后的字母
-                
-                # 查找原始数据
-                if letter != "?" and (letter, age) in self.db.DATA_BY_LETTER:
-                    base, add, original_correction = self.db.DATA_BY_LETTER[(letter, age)]
-                    formula = f"{base}+{add}"
-                    original_fortune = str(base + add)
-                    
-                    # 计算校正后的条文校正数
-                    corrected_correction = self.calculate_correction(original_correction, age)
-                    
-                    # 根据新的校正数查找校正后的条文
-                    if corrected_correction > 0 and (corrected_correction, age) in self.db.DATA_BY_CORRECTION:
-                        corr_base, corr_add = self.db.DATA_BY_CORRECTION[(corrected_correction, age)]
-                        corrected_fortune = str(corr_base + corr_add)
-                        # 查找校正后的字母（可选）
-                        corrected_letter = self.db.CORRECTION_TO_LETTER.get((corrected_correction, age), "?")
-                
-                # ========== 新增：获取断语信息 ==========
-                # 原始条文断语
-                original_duanyu, original_duanyu_age = self.get_fortune_duanyu(original_fortune)
-                # 校正后条文断语
-                corrected_duanyu, corrected_duanyu_age = self.get_fortune_duanyu(corrected_fortune)
+                cur_dz = DIZHI[(st_dz + age - 1) % 12]
+                sound = final_seq[(age - 1) % 12]
+                marker = marker_lookup.get((cur_dz, pn_num), "?")
+                letter = letter_table.get((moment_cn, "奇数" if age % 2 != 0 else "偶数", sound, marker), "?")
                 
                 # 构建流年数据
-                liunian.append({
+                item = {
                     "age": age, 
-                    "year": f"{cur_tg}{cur_dz}", 
+                    "year": f"{TIANGAN[(st_tg + age - 1) % 10]}{cur_dz}", 
                     "sound": sound,
                     "marker": marker, 
                     "letter": letter,
-                    "corrected_letter": corrected_letter,
-                    "original_correction": str(original_correction),
-                    "corrected_correction": str(corrected_correction),
-                    "formula": formula, 
-                    "original_fortune": original_fortune,
-                    "corrected_fortune": corrected_fortune,
-                    # 新增断语字段
-                    "original_duanyu": original_duanyu,          # 原始条文断语
-                    "original_duanyu_age": original_duanyu_age,  # 原始条文对应年龄
-                    "corrected_duanyu": corrected_duanyu,        # 校正后条文断语
-                    "corrected_duanyu_age": corrected_duanyu_age # 校正后条文对应年龄
-                })
+                }
+                item.update(rows.get((letter, age), empty_row))
+                liunian.append(item)
         except Exception as e:
+            if self.strict:
+                raise TieBanError(f"计算流年数据时出错: {e}") from e
             print(f"计算流年数据时出错: {e}")
             traceback.print_exc()
             pass
             
         details['liunian'] = liunian
-        return details
 
     def print_report(self, res):
-        print("\n" + "="*220)
-        print(res['header_info'])
-        print("="*220 + "\n")
-        
-        print("【基础排盘信息】")
-        print(f"{res['cong_calc']}")
-        print(f"五音命数 = {res['tone_num']}")
-        print(f"{res['day_life_calc']}")
-        print(f"{res['moment_calc']}")
-        print(f"{res['main_calc']}")
-        print(f"十二辟卦: {res['hex_name']}")
-        
-        print("\n【本命条文】")
+        print(self.renderer.render_console(res))
+
+    def save_to_md(self, res, b_str, q_str, cache=None):
+        """保存排盘结果到Markdown文件，返回文件路径"""
+        return self._save_report(res, b_str, q_str, "md", cache)
+
+    def save_to_html(self, res, b_str, q_str, cache=None):
+        """保存排盘结果到HTML文件，返回文件路径"""
+        return self._save_report(res, b_str, q_str, "html", cache)
+
+    def _save_report(self, res, b_str, q_str, fmt, cache=None):
+        # 经结果缓存写出：缓存中没有时先写入缓存，再复制为 output/ 下的命名报告
+        cache = cache if cache is not None else ReportCache()
+        key = cache.key(res['payload'])
+        if cache.get(key, fmt) is None:
+            cache.put(key, res, self.renderer)
+        fname = cache.save_report(key, fmt, b_str, q_str)
+        print(f"\n[完成] 排盘报告已保存至: {os.path.abspath(fname)}")
+        return fname
+
+def diff_charts(old, new):
+    """
+    比较两次排盘结果，返回紧凑的差异：
+    {"fields": {字段: [旧值, 新值]}, "liunian": [{"age": 岁数, "changes": {字段: [旧值, 新值]}}, ...]}
+    流年列表为同一对象（recalculate 未重算流年）时直接跳过逐行比较
+    """
+    fields = {}
+    for key in old.keys() | new.keys():
+        if key in ("liunian", "payload"):
+            continue
+        if old.get(key) != new.get(key):
+            fields[key] = [old.get(key), new.get(key)]
+
+    rows = []
+    old_rows, new_rows = old.get('liunian', []), new.get('liunian', [])
+    if old_rows is not new_rows:
+        old_by_age = {item['age']: item for item in old_rows}
+        for item in new_rows:
+            prev = old_by_age.get(item['age'], {})
+            if prev == item:
+                continue
+            rows.append({"age": item['age'],
+                         "changes": {k: [prev.get(k), v] for k, v in item.items() if prev.get(k) != v}})
+    return {"fields": fields, "liunian": rows}
+
+# ==============================================================================
+# 4. 报告渲染
+# ==============================================================================
+class ReportRenderer:
+    """
+    报告渲染层：表头在类定义时预先拼好；流年行中 字母 之后的 9 列只取决于 (流年字母, 岁数)，
+    由 loader 加载时按格式预渲染（LIUNIAN_TAILS），每份报告只需格式化前 5 列再拼接行尾。
+    整份报告先渲染到一个缓冲区，再一次性输出（print / write），避免逐行 I/O
+    """
+    FORMATS = ("console", "md", "html")
+    SEP = "=" * 220
+    CONSOLE_HEADER = (f"{'岁数':<6}{'干支':<6}{'四声':<6}{'标记':<6}{'字母':<6}"
+                      f"{'校正数':<8}{'校正后校正数':<12}{'计算公式':<10}"
+                      f"{'原条文':<8}{'原断语':<30}{'原断语年龄':<10}"
+                      f"{'校正后条文':<10}{'校正后断语':<30}{'校正后断语年龄':<10}")
+    MD_HEADER = ("| 岁数 | 干支 | 四声 | 标记 | 字母 | 校正数 | 校正后校正数 | 计算公式 | 原条文 | 原断语 | 原断语年龄 | 校正后条文 | 校正后断语 | 校正后断语年龄 |\n"
+                 "|------|------|------|------|------|--------|--------------|----------|--------|--------|------------|------------|------------|----------------|")
+    HTML_HEADER = ("<tr><th>岁数</th><th>干支</th><th>四声</th><th>标记</th><th>字母</th>"
+                   "<th>校正数</th><th>校正后校正数</th><th>计算公式</th>"
+                   "<th>原条文</th><th>原断语</th><th>原断语年龄</th>"
+                   "<th>校正后条文</th><th>校正后断语</th><th>校正后断语年龄</th></tr>")
+
+    def __init__(self, loader=None):
+        # 传入 loader 时使用其预渲染的流年行尾，结果须由同一份数据库算出；
+        # 不传时（如命中缓存而未加载数据库）逐行现算，输出相同
+        self.loader = loader
+
+    @staticmethod
+    def _cut(text):
+        # 截断过长的断语，保持表格整洁
+        return text[:28] + ".." if len(text) > 30 else text
+
+    @staticmethod
+    def _md_escape(text):
+        # 处理Markdown中的特殊字符
+        if '|' in text or '\n' in text:
+            return text.replace('|', '｜').replace('\n', ' ')
+        return text
+
+    @classmethod
+    def liunian_tail(cls, i, fmt):
+        """流年行中 字母 之后的部分（校正数 ~ 校正后断语年龄）"""
+        if fmt == "console":
+            cut = cls._cut
+            return (f"{i['original_correction']:<8}{i['corrected_correction']:<12}{i['formula']:<10}"
+                    f"{i['original_fortune']:<8}{cut(i['original_duanyu']):<30}{i['original_duanyu_age']:<10}"
+                    f"{i['corrected_fortune']:<10}{cut(i['corrected_duanyu']):<30}{i['corrected_duanyu_age']:<10}")
+        if fmt == "md":
+            esc = cls._md_escape
+            return (f"{i['original_correction']} | {i['corrected_correction']} | {i['formula']} | "
+                    f"{i['original_fortune']} | {esc(i['original_duanyu'])} | {i['original_duanyu_age']} | "
+                    f"{i['corrected_fortune']} | {esc(i['corrected_duanyu'])} | {i['corrected_duanyu_age']} |")
+        if fmt == "html":
+            esc = html.escape
+            return (f"<td>{i['original_correction']}</td><td>{i['corrected_correction']}</td><td>{i['formula']}</td>"
+                    f"<td>{i['original_fortune']}</td><td>{esc(i['original_duanyu'])}</td><td>{esc(i['original_duanyu_age'])}</td>"
+                    f"<td>{i['corrected_fortune']}</td><td>{esc(i['corrected_duanyu'])}</td><td>{esc(i['corrected_duanyu_age'])}</td></tr>")
+        raise ValueError(f"未知的报告格式: {fmt}")
+
+    def _liunian_rows(self, res, fmt):
+        """1-100 岁的流年行及其行尾"""
+        rows = [i for i in res['liunian'] if 1 <= i['age'] <= 100]
+        if self.loader is not None:
+            tails, empty = self.loader.LIUNIAN_TAILS[fmt], self.loader.EMPTY_LIUNIAN_TAIL[fmt]
+            return zip(rows, [tails.get((i['letter'], i['age']), empty) for i in rows])
+        tail = self.liunian_tail
+        return [(i, tail(i, fmt)) for i in rows]
+
+    def render(self, res, fmt="md"):
+        if fmt == "md":
+            return self.render_markdown(res)
+        if fmt == "html":
+            return self.render_html(res)
+        if fmt == "console":
+            return self.render_console(res)
+        raise ValueError(f"未知的报告格式: {fmt}")
+
+    def render_batch(self, results, fmt="md", workers=None):
+        """
+        在进程池中并行渲染一批报告，返回与 results 顺序一致的字符串列表
+        渲染是纯 Python 计算，线程受 GIL 限制没有收益，故使用进程；
+        结果需在进程间序列化，批量较小时直接串行渲染更快
+        """
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(results) < 2 * workers:
+            return [self.render(r, fmt) for r in results]
+        chunksize = max(1, len(results) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_render_report, results, [fmt] * len(results), chunksize=chunksize))
+
+    def render_console(self, res):
+        out = ["\n" + self.SEP, res['header_info'], self.SEP + "\n", "【基础排盘信息】",
+               res['cong_calc'], f"五音命数 = {res['tone_num']}", res['day_life_calc'],
+               res['moment_calc'], res['main_calc'], f"十二辟卦: {res['hex_name']}", "\n【本命条文】"]
         if res['tbl_data']:
             tbl = res['tbl_data']
             base, seq, offsets = tbl['base'], tbl['seq'], tbl['offsets']
-            print(f"十二辟卦 —— {res['hex_name']}  +{base}")
-            print(f"{res['moment_cn']}生人  先天命数 {res['cong_num']}")
-            print("-" * 60)
-            print(f"{'序数':<6}{'性格':<10}{'才能前程':<10}{'财运':<10}{'兄弟个数':<10}")
-            s_char = ",".join(map(str, offsets['性格']))
-            s_car = ",".join(map(str, offsets['才能前程']))
-            s_wea = ",".join(map(str, offsets['财运']))
-            s_bro = ",".join(map(str, offsets['兄弟个数']))
-            print(f"{seq:<6}{s_char:<10}{s_car:<10}{s_wea:<10}{s_bro:<10}")
-            print("-" * 60)
-            print("\n本命条文详细计算：")
-            def print_calc(title, offset_list):
-                for off in offset_list:
-                    print(f"  {title}: {base} + {seq} + {off} = {base+seq+off}")
-            print_calc("(1) 性格", offsets['性格'])
-            print_calc("(2) 才能、前程", offsets['才能前程'])
-            print_calc("(3) 财运", offsets['财运'])
-            print_calc("(4) 兄弟个数", offsets['兄弟个数'])
+            s_char, s_car, s_wea, s_bro = (",".join(map(str, offsets[k])) for k in ['性格', '才能前程', '财运', '兄弟个数'])
+            out += [f"十二辟卦 —— {res['hex_name']}  +{base}",
+                    f"{res['moment_cn']}生人  先天命数 {res['cong_num']}",
+                    "-" * 60,
+                    f"{'序数':<6}{'性格':<10}{'才能前程':<10}{'财运':<10}{'兄弟个数':<10}",
+                    f"{seq:<6}{s_char:<10}{s_car:<10}{s_wea:<10}{s_bro:<10}",
+                    "-" * 60,
+                    "\n本命条文详细计算："]
+            texts = {(item, off): (duanyu, age) for item, off, _, duanyu, age in res.get('benming', ())}
+            for title, key in [("(1) 性格", '性格'), ("(2) 才能、前程", '才能前程'), ("(3) 财运", '财运'), ("(4) 兄弟个数", '兄弟个数')]:
+                for off in offsets[key]:
+                    line = f"  {title}: {base} + {seq} + {off} = {base+seq+off}"
+                    if (key, off) in texts:
+                        duanyu, age = texts[(key, off)]
+                        line += f"  {duanyu}" + (f"（{age}）" if age else "")
+                    out.append(line)
         else:
-            print(f"  [提示] 未在 14-10 表中找到匹配的条文数据 (卦名: {res['hex_name']}, 刻别: {res['moment_cn']}, 先天数: {res['cong_num']})")
-
-        print("\n【流年条文 (1-100岁)】")
-        print("=" * 220)
-        # 打印表头（包含断语列）
-        header_parts = [
-            f"{'岁数':<6}", f"{'干支':<6}", f"{'四声':<6}", f"{'标记':<6}", f"{'字母':<6}",
-            f"{'校正数':<8}", f"{'校正后校正数':<12}", f"{'计算公式':<10}",
-            f"{'原条文':<8}", f"{'原断语':<30}", f"{'原断语年龄':<10}",
-            f"{'校正后条文':<10}", f"{'校正后断语':<30}", f"{'校正后断语年龄':<10}"
-        ]
-        print("".join(header_parts))
-        print("=" * 220)
-        
-        # 打印1-100岁的流年数据
-        for i in [item for item in res['liunian'] if 1 <= item['age'] <= 100]:
-            # 截断过长的断语，保持表格整洁
-            original_duanyu = i['original_duanyu'][:28] + ".." if len(i['original_duanyu']) > 30 else i['original_duanyu']
-            corrected_duanyu = i['corrected_duanyu'][:28] + ".." if len(i['corrected_duanyu']) > 30 else i['corrected_duanyu']
-            
-            row_parts = [
-                f"{i['age']:<6}", f"{i['year']:<6}", f"{i['sound']:<6}", f"{i['marker']:<6}", f"{i['letter']:<6}",
-                f"{i['original_correction']:<8}", f"{i['corrected_correction']:<12}", f"{i['formula']:<10}",
-                f"{i['original_fortune']:<8}", f"{original_duanyu:<30}", f"{i['original_duanyu_age']:<10}",
-                f"{i['corrected_fortune']:<10}", f"{corrected_duanyu:<30}", f"{i['corrected_duanyu_age']:<10}"
-            ]
-            print("".join(row_parts))
-        print("=" * 220)
-
-    def save_to_md(self, res, b_str, q_str):
-        """保存排盘结果到Markdown文件"""
-        if not os.path.exists("output"):
-            os.makedirs("output")
-        
-        fname = f"output/铁板排盘_{b_str.split()[0]}_{q_str.split()[0]}.md"
-        with open(fname, "w", encoding="utf-8") as f:
-            # 写入基础信息
-            f.write("# 铁板神数排盘结果\n\n")
-            f.write(f"**排盘时间**: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-            f.write(f"## 基础信息\n")
-            f.write(f"```\n{res['header_info']}\n```\n\n")
-            
-            # 写入基础排盘数据
-            f.write("## 基础排盘\n")
-            f.write(f"- 先天命数：{res['cong_calc']}\n")
-            f.write(f"- 五音命数：{res['tone_num']}\n")
-            f.write(f"- 日命数 & 时运数：{res['day_life_calc']}\n")
-            f.write(f"- 考刻结果：{res['moment_calc']}\n")
-            f.write(f"- 本命数：{res['main_calc']}\n")
-            f.write(f"- 十二辟卦：{res['hex_name']}\n\n")
-            
-            # 写入本命条文
-            f.write("## 本命条文\n")
-            if res['tbl_data']:
-                tbl = res['tbl_data']
-                base, seq, offsets = tbl['base'], tbl['seq'], tbl['offsets']
-                f.write(f"**{res['moment_cn']}生人 - 先天命数 {res['cong_num']} - {res['hex_name']}(+{base})**\n\n")
-                f.write("| 项目 | 数值 | 计算公式 |\n")
-                f.write("|------|------|----------|\n")
-                f.write(f"| 序数 | {seq} | - |\n")
-                for item, values in offsets.items():
-                    for val in values:
-                        total = base + seq + val
-                        f.write(f"| {item} | {total} | {base} + {seq} + {val} = {total} |\n")
-            else:
-                f.write("未找到匹配的本命条文数据\n\n")
-            
-            # 写入流年条文表格（包含断语）
-            f.write("## 流年条文 (1-100岁)\n")
-            f.write("| 岁数 | 干支 | 四声 | 标记 | 字母 | 校正数 | 校正后校正数 | 计算公式 | 原条文 | 原断语 | 原断语年龄 | 校正后条文 | 校正后断语 | 校正后断语年龄 |\n")
-            f.write("|------|------|------|------|------|--------|--------------|----------|--------|--------|------------|------------|------------|----------------|\n")
-            
-            for i in [item for item in res['liunian'] if 1 <= item['age'] <= 100]:
-                # 处理Markdown中的特殊字符
-                original_duanyu = i['original_duanyu'].replace('|', '｜').replace('\n', ' ')
-                corrected_duanyu = i['corrected_duanyu'].replace('|', '｜').replace('\n', ' ')
-                
-                f.write(f"| {i['age']} | {i['year']} | {i['sound']} | {i['marker']} | {i['letter']} | "
-                        f"{i['original_correction']} | {i['corrected_correction']} | {i['formula']} | "
-                        f"{i['original_fortune']} | {original_duanyu} | {i['original_duanyu_age']} | "
-                        f"{i['corrected_fortune']} | {corrected_duanyu} | {i['corrected_duanyu_age']} |\n")
-        
-        print(f"\n[完成] 排盘报告已保存至: {os.path.abspath(fname)}")
+            out.append(f"  [提示] 未在 14-10 表中找到匹配的条文数据 (卦名: {res['hex_name']}, 刻别: {res['moment_cn']}, 先天数: {res['cong_num']})")
+
+        out += ["\n【流年条文 (1-100岁)】", self.SEP, self.CONSOLE_HEADER, self.SEP]
+        out += [f"{i['age']:<6}{i['year']:<6}{i['sound']:<6}{i['marker']:<6}{i['letter']:<6}{tail}"
+                for i, tail in self._liunian_rows(res, "console")]
+        out.append(self.SEP)
+        return "\n".join(out)
+
+    def render_markdown(self, res, generated_at=None):
+        generated_at = generated_at or datetime.datetime.now()
+        out = ["# 铁板神数排盘结果\n",
+               f"**排盘时间**: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}\n",
+               "## 基础信息",
+               f"```\n{res['header_info']}\n```\n",
+               "## 基础排盘",
+               f"- 先天命数：{res['cong_calc']}",
+               f"- 五音命数：{res['tone_num']}",
+               f"- 日命数 & 时运数：{res['day_life_calc']}",
+               f"- 考刻结果：{res['moment_calc']}",
+               f"- 本命数：{res['main_calc']}",
+               f"- 十二辟卦：{res['hex_name']}\n",
+               "## 本命条文"]
+        if res['tbl_data']:
+            tbl = res['tbl_data']
+            base, seq, offsets = tbl['base'], tbl['seq'], tbl['offsets']
+            out += [f"**{res['moment_cn']}生人 - 先天命数 {res['cong_num']} - {res['hex_name']}(+{base})**\n",
+                    "| 项目 | 数值 | 计算公式 | 断语 | 断语年龄 |",
+                    "|------|------|----------|------|----------|",
+                    f"| 序数 | {seq} | - | | |"]
+            texts = {(item, off): (duanyu, age) for item, off, _, duanyu, age in res.get('benming', ())}
+            for item, values in offsets.items():
+                for val in values:
+                    duanyu, age = texts.get((item, val), ("", ""))
+                    out.append(f"| {item} | {base+seq+val} | {base} + {seq} + {val} = {base+seq+val} | {self._md_escape(duanyu)} | {age} |")
+        else:
+            out.append("未找到匹配的本命条文数据\n")
+
+        out += ["## 流年条文 (1-100岁)", self.MD_HEADER]
+        out += [f"| {i['age']} | {i['year']} | {i['sound']} | {i['marker']} | {i['letter']} | {tail}"
+                for i, tail in self._liunian_rows(res, "md")]
+        out.append("")
+        return "\n".join(out)
+
+    def render_html(self, res, generated_at=None):
+        generated_at = generated_at or datetime.datetime.now()
+        esc = html.escape
+        out = ['<!DOCTYPE html>', '<html lang="zh-CN">', '<head><meta charset="utf-8"><title>铁板神数排盘结果</title>',
+               '<style>table{border-collapse:collapse}td,th{border:1px solid #999;padding:2px 6px}</style></head>',
+               '<body>', '<h1>铁板神数排盘结果</h1>',
+               f"<p><b>排盘时间</b>: {generated_at.strftime('%Y-%m-%d %H:%M:%S')}</p>",
+               '<h2>基础信息</h2>', f"<pre>{esc(res['header_info'])}</pre>",
+               '<h2>基础排盘</h2>', '<ul>',
+               f"<li>先天命数：{esc(res['cong_calc'])}</li>",
+               f"<li>五音命数：{res['tone_num']}</li>",
+               f"<li>日命数 &amp; 时运数：{esc(res['day_life_calc'])}</li>",
+               f"<li>考刻结果：{esc(res['moment_calc'])}</li>",
+               f"<li>本命数：{esc(res['main_calc'])}</li>",
+               f"<li>十二辟卦：{esc(res['hex_name'])}</li>", '</ul>',
+               '<h2>本命条文</h2>']
+        if res['tbl_data']:
+            tbl = res['tbl_data']
+            base, seq, offsets = tbl['base'], tbl['seq'], tbl['offsets']
+            out += [f"<p><b>{res['moment_cn']}生人 - 先天命数 {res['cong_num']} - {esc(res['hex_name'])}(+{base})</b></p>",
+                    '<table>', '<tr><th>项目</th><th>数值</th><th>计算公式</th><th>断语</th><th>断语年龄</th></tr>',
+                    f"<tr><td>序数</td><td>{seq}</td><td>-</td><td></td><td></td></tr>"]
+            texts = {(item, off): (duanyu, age) for item, off, _, duanyu, age in res.get('benming', ())}
+            for item, values in offsets.items():
+                for val in values:
+                    duanyu, age = texts.get((item, val), ("", ""))
+                    out.append(f"<tr><td>{item}</td><td>{base+seq+val}</td><td>{base} + {seq} + {val} = {base+seq+val}</td>"
+                               f"<td>{esc(duanyu)}</td><td>{esc(age)}</td></tr>")
+            out.append('</table>')
+        else:
+            out.append('<p>未找到匹配的本命条文数据</p>')
+
+        out += ['<h2>流年条文 (1-100岁)</h2>', '<table>', self.HTML_HEADER]
+        out += [f"<tr><td>{i['age']}</td><td>{i['year']}</td><td>{i['sound']}</td><td>{esc(i['marker'])}</td><td>{esc(i['letter'])}</td>{tail}"
+                for i, tail in self._liunian_rows(res, "html")]
+        out += ['</table>', '</body>', '</html>', '']
+        return "\n".join(out)
+
+def _render_report(res, fmt):
+    """进程池渲染入口（ReportRenderer 无状态，每次新建即可）"""
+    return ReportRenderer().render(res, fmt)
+
+# ==============================================================================
+# 5. 库接口 (线程安全 / 异步)
+# ==============================================================================
+class TieBanService:
+    """
+    面向库调用的排盘接口：无 input()/print 副作用，错误统一以 TieBanError 抛出
+
+    并发约定：数据库表与全部预计算查找表在构造时一次性建好，此后只读；
+    calculate 只读取共享表、每次返回新建的结果对象，因此同一实例可被任意多个线程
+    或协程同时调用，无需加锁。异步接口的执行器由 executor 指定：
+    "thread"（默认）为线程池；"process" 为进程池，每个进程各自加载一份数据库以绕开 GIL；
+    None 表示仅使用同步接口
+    """
+    def __init__(self, db_folder="./数据库", executor="thread", max_workers=None, timeout=None):
+        self.db_folder = db_folder
+        self.timeout = timeout              # 异步接口的默认超时（秒），None 表示不限
+        if not os.path.isdir(db_folder):
+            raise TieBanError(f"数据库文件夹不存在: {os.path.abspath(db_folder)}")
+        self.calculator = TieBanCalculator(TieBanDataLoader(db_folder, verbose=False), strict=True)
+        self.use_processes = executor == "process"
+        if executor == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tieban")
+        elif executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_service_worker_init,
+                                                initargs=(db_folder,))
+        elif executor is None:
+            self.executor = None
+        else:
+            raise TieBanError(f"未知的执行器类型: {executor!r}，应为 'thread'、'process' 或 None")
+
+    def close(self, wait=True):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 同步接口 ----------
+    def bazi(self, dt_obj):
+        if not isinstance(dt_obj, datetime.datetime):
+            raise TieBanError(f"时间应为 datetime.datetime，收到 {type(dt_obj).__name__}: {dt_obj!r}")
+        return bazi_info(normalize_zi_hour(dt_obj))
+
+    def calculate(self, payload):
+        try:
+            return self.calculator.calculate(payload)
+        except TieBanError:
+            raise
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise TieBanError(f"排盘输入无效: {e}") from e
+
+    def chart(self, gender, birth_dt, query_dt):
+        """由性别与出生/求测时间直接排盘，返回与 TieBanCalculator.calculate 相同的结果字典"""
+        return self.calculate({
+            "birth_info": self.bazi(birth_dt),
+            "query_info": self.bazi(query_dt),
+            "gender": gender
+        })
+
+    def recalculate(self, prev, gender=None, query_dt=None):
+        """在已有结果上修改性别和/或求测时间，只重算受影响的步骤；返回 (新结果, 差异)"""
+        if 'payload' not in prev:
+            raise TieBanError("原结果缺少排盘输入 (payload)，无法增量重算")
+        query_info = None if query_dt is None else self.bazi(query_dt)
+        try:
+            new = self.calculator.recalculate(prev, gender=gender, query_info=query_info)
+            return new, diff_charts(prev, new)
+        except TieBanError:
+            raise
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            raise TieBanError(f"原排盘结果无效: {e}") from e
+
+    # ---------- 异步接口 ----------
+    async def _run(self, fn, *args, timeout=None):
+        """
+        在执行器中运行 fn；超时抛出 TimeoutError。
+        协程被取消或超时时，尚未开始的任务会从执行器队列中撤销；
+        已在线程中运行的任务无法中断，其结果将被丢弃
+        """
+        if self.executor is None:
+            raise TieBanError("该实例未配置执行器，只能使用同步接口")
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self.executor, fn, *args)
+        return await asyncio.wait_for(fut, self.timeout if timeout is None else timeout)
+
+    async def abazi(self, dt_obj, timeout=None):
+        if self.use_processes:
+            return await self._run(_service_worker_bazi, dt_obj, timeout=timeout)
+        return await self._run(self.bazi, dt_obj, timeout=timeout)
+
+    async def acalculate(self, payload, timeout=None):
+        if self.use_processes:
+            return await self._run(_service_worker_calculate, payload, timeout=timeout)
+        return await self._run(self.calculate, payload, timeout=timeout)
+
+    async def achart(self, gender, birth_dt, query_dt, timeout=None):
+        if self.use_processes:
+            return await self._run(_service_worker_chart, gender, birth_dt, query_dt, timeout=timeout)
+        return await self._run(self.chart, gender, birth_dt, query_dt, timeout=timeout)
+
+    async def arecalculate(self, prev, gender=None, query_dt=None, timeout=None):
+        if self.use_processes:
+            return await self._run(_service_worker_recalculate, prev, gender, query_dt, timeout=timeout)
+        return await self._run(self.recalculate, prev, gender, query_dt, timeout=timeout)
+
+
+_SERVICE = None
+
+def _service_worker_init(db_folder):
+    """进程池初始化：每个工作进程只加载一次数据库"""
+    global _SERVICE
+    _SERVICE = TieBanService(db_folder, executor=None)
+
+def _service_worker_bazi(dt_obj):
+    return _SERVICE.bazi(dt_obj)
+
+def _service_worker_calculate(payload):
+    return _SERVICE.calculate(payload)
+
+def _service_worker_chart(gender, birth_dt, query_dt):
+    return _SERVICE.chart(gender, birth_dt, query_dt)
+
+def _service_worker_recalculate(prev, gender, query_dt):
+    return _SERVICE.recalculate(prev, gender, query_dt)
+
+# ==============================================================================
+# 6. 群体统计 (Cohort Analytics)
+# ==============================================================================
+def iter_birth_times(start_year, end_year):
+    """逐个时辰生成出生时间（每日 0,2,...,22 点各取一个代表时刻）"""
+    day = datetime.date(start_year, 1, 1)
+    last = datetime.date(end_year, 12, 31)
+    while day <= last:
+        for hour in range(0, 24, 2):
+            yield datetime.datetime(day.year, day.month, day.day, hour, 0)
+        day += datetime.timedelta(days=1)
+
+
+class CohortStats:
+    """
+    群体统计累加器：只保留计数，不保留单盘结果
+    各进程各自累加，最后通过 merge 合并
+    """
+    def __init__(self, query_str="", genders=()):
+        self.query_str = query_str           # 求测时间：日命数/时运数取决于它，写入汇总表以便区分不同批次
+        self.genders = tuple(genders)
+        self.total = 0
+        self.failed = 0
+        self.hex_counts = Counter()          # 十二辟卦 -> 次数
+        self.moment_counts = Counter()       # 刻别 -> 次数
+        self.pn_counts = Counter()           # 后天命数 -> 次数
+        self.age_fortunes = {}               # 岁数 -> Counter(原条文)
+        self.age_corrected_fortunes = {}     # 岁数 -> Counter(校正后条文)
+
+    def add(self, res):
+        """将一张排盘结果计入统计"""
+        self.total += 1
+        self.hex_counts[res['hex_name']] += 1
+        self.moment_counts[res['moment_cn']] += 1
+        self.pn_counts[res['pn_num']] += 1
+        for item in res['liunian']:
+            age = item['age']
+            if item['original_fortune']:
+                self.age_fortunes.setdefault(age, Counter())[item['original_fortune']] += 1
+            if item['corrected_fortune']:
+                self.age_corrected_fortunes.setdefault(age, Counter())[item['corrected_fortune']] += 1
+
+    def merge(self, other):
+        """合并另一份统计（原地修改并返回自身）"""
+        self.total += other.total
+        self.failed += other.failed
+        self.hex_counts.update(other.hex_counts)
+        self.moment_counts.update(other.moment_counts)
+        self.pn_counts.update(other.pn_counts)
+        for own, theirs in [(self.age_fortunes, other.age_fortunes),
+                            (self.age_corrected_fortunes, other.age_corrected_fortunes)]:
+            for age, counter in theirs.items():
+                own.setdefault(age, Counter()).update(counter)
+        return self
+
+    def top_fortunes(self, age, n=10, corrected=False):
+        """返回某岁数出现最多的 n 个条文数：[(条文, 次数), ...]"""
+        table = self.age_corrected_fortunes if corrected else self.age_fortunes
+        return table.get(age, Counter()).most_common(n)
+
+    def write_tables(self, out_dir, prefix="cohort"):
+        """写出紧凑的统计表 (CSV)，返回写出的文件路径列表"""
+        os.makedirs(out_dir, exist_ok=True)
+        summary_path = os.path.join(out_dir, f"{prefix}_summary.csv")
+        with open(summary_path, "w", encoding="utf-8-sig", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["类别", "取值", "次数"])
+            w.writerow(["求测时间", self.query_str, ""])
+            w.writerow(["性别", "/".join(self.genders), ""])
+            w.writerow(["总盘数", "", self.total])
+            w.writerow(["转换或计算失败", "", self.failed])
+            for category, counter in [("十二辟卦", self.hex_counts),
+                                      ("刻别", self.moment_counts),
+                                      ("后天命数", self.pn_counts)]:
+                for key, cnt in sorted(counter.items(), key=lambda kv: (-kv[1], str(kv[0]))):
+                    w.writerow([category, key, cnt])
+
+        ages_path = os.path.join(out_dir, f"{prefix}_age_fortunes.csv")
+        with open(ages_path, "w", encoding="utf-8-sig", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["岁数", "类型", "条文", "次数"])
+            for kind, table in [("原条文", self.age_fortunes), ("校正后条文", self.age_corrected_fortunes)]:
+                for age in sorted(table):
+                    for num, cnt in table[age].most_common():
+                        w.writerow([age, kind, num, cnt])
+        return [summary_path, ages_path]
+
+
+_COHORT_CALC = None
+
+def _cohort_worker_init():
+    """进程池初始化：每个工作进程只加载一次数据库；工作进程不向控制台输出，出错计入 failed"""
+    global _COHORT_CALC
+    _COHORT_CALC = TieBanCalculator(TieBanDataLoader(verbose=False), strict=True)
+
+def _cohort_worker(year, genders, query_info):
+    """统计一个年份内所有时辰的出生盘，返回该年的 CohortStats"""
+    stats = CohortStats()
+    for dt in iter_birth_times(year, year):
+        try:
+            info_b = bazi_info(dt)
+        except TieBanError:
+            stats.failed += len(genders)
+            continue
+        for gender in genders:
+            try:
+                res = _COHORT_CALC.calculate({
+                    "birth_info": info_b,
+                    "query_info": query_info,
+                    "gender": gender
+                })
+            except TieBanError:
+                stats.failed += 1
+                continue
+            stats.add(res)
+    return stats
+
+def run_cohort_analysis(start_year, end_year, query_dt, genders=("男", "女"), workers=None):
+    """
+    按年份切分，在进程池中并行统计 start_year ~ end_year 的全部出生时辰
+    返回合并后的 CohortStats
+    """
+    query_info = bazi_info(query_dt)
+    years = list(range(start_year, end_year + 1))
+    total = CohortStats(query_info['date_str'], genders)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_cohort_worker_init) as pool:
+        futures = [pool.submit(_cohort_worker, y, tuple(genders), query_info) for y in years]
+        for year, fut in zip(years, futures):
+            total.merge(fut.result())
+            print(f"  > {year} 年统计完成，累计 {total.total} 盘")
+    return total
+
+# ==============================================================================
+# 7. 结果缓存
+# ==============================================================================
+class ReportCache:
+    """
+    output/cache 下的内容寻址结果缓存
+    键 = sha256(规范化排盘输入 + 数据库版本)，同一张盘不论由谁求测都落在同一条目，
+    数据库 CSV 有任何改动时版本随之变化，旧条目自然失效
+    """
+    FORMAT_VERSION = 3
+    FORMATS = ("json", "md", "html")
+
+    def __init__(self, root=os.path.join("output", "cache"), db_folder="./数据库", max_bytes=200 * 1024 * 1024):
+        self.root = root
+        self.db_folder = db_folder
+        self.max_bytes = max_bytes
+        self._db_version = None
+
+    @property
+    def db_version(self):
+        """数据库文件夹内全部文件（文件名 + 内容）的哈希"""
+        if self._db_version is None:
+            h = hashlib.sha256()
+            if os.path.isdir(self.db_folder):
+                for name in sorted(os.listdir(self.db_folder)):
+                    path = os.path.join(self.db_folder, name)
+                    if os.path.isfile(path):
+                        h.update(name.encode("utf-8"))
+                        with open(path, "rb") as f:
+                            h.update(f.read())
+            self._db_version = h.hexdigest()
+        return self._db_version
+
+    def key(self, payload):
+        """由排盘输入计算缓存键"""
+        canonical = json.dumps({
+            "v": self.FORMAT_VERSION,
+            "db": self.db_version,
+            "gender": payload['gender'],
+            "birth": payload['birth_info'],
+            "query": payload['query_info'],
+        }, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def path(self, key, fmt):
+        return os.path.join(self.root, key[:2], f"{key}.{fmt}")
+
+    def get(self, key, fmt="md"):
+        """命中时返回缓存文件路径并刷新其访问时间，未命中返回 None"""
+        path = self.path(key, fmt)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def load_result(self, key):
+        """读取缓存的排盘结果 (JSON)，未命中或文件损坏时返回 None"""
+        path = self.get(key, "json")
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, res, renderer):
+        """写入排盘结果及其各格式报告，返回 {格式: 路径}"""
+        contents = {
+            "json": json.dumps(res, ensure_ascii=False),
+            "md": renderer.render_markdown(res),
+            "html": renderer.render_html(res),
+        }
+        paths = {fmt: self._atomic_write(self.path(key, fmt), text) for fmt, text in contents.items()}
+        self.evict()
+        return paths
+
+    @staticmethod
+    def _atomic_write(path, text):
+        # 先写同目录临时文件再 os.replace：并发写同一键时读者只会看到完整文件
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        return path
+
+    @staticmethod
+    def report_path(key, fmt, b_str, q_str, out_dir="output"):
+        """
+        output/ 下的命名报告路径：出生/求测日期时间便于辨认，
+        附带缓存键前缀区分同一日期下不同性别、时辰的求测，避免互相覆盖
+        """
+        b_tag = b_str.replace(" ", "-").replace(":", "")
+        q_tag = q_str.replace(" ", "-").replace(":", "")
+        return os.path.join(out_dir, f"铁板排盘_{b_tag}_{q_tag}_{key[:8]}.{fmt}")
+
+    def save_report(self, key, fmt, b_str, q_str, out_dir="output"):
+        """
+        把缓存中的报告复制为 output/ 下的命名报告并返回其路径
+        命名报告不受缓存淘汰/清理影响；缓存中没有该条目时抛出 FileNotFoundError
+        """
+        src = self.get(key, fmt)
+        if src is None:
+            raise FileNotFoundError(f"缓存中没有条目 {key}.{fmt}")
+        with open(src, "r", encoding="utf-8") as f:
+            text = f.read()
+        return self._atomic_write(self.report_path(key, fmt, b_str, q_str, out_dir), text)
+
+    def list_entries(self):
+        """列出缓存条目：[{key, size, mtime, formats}, ...]，按最近使用时间倒序"""
+        entries = {}
+        if not os.path.isdir(self.root):
+            return []
+        for sub in os.listdir(self.root):
+            folder = os.path.join(self.root, sub)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                key, _, fmt = name.partition(".")
+                if fmt not in self.FORMATS:
+                    continue
+                try:
+                    st = os.stat(os.path.join(folder, name))
+                except FileNotFoundError:
+                    continue
+                e = entries.setdefault(key, {"key": key, "size": 0, "mtime": 0.0, "formats": []})
+                e["size"] += st.st_size
+                e["mtime"] = max(e["mtime"], st.st_mtime)
+                e["formats"].append(fmt)
+        return sorted(entries.values(), key=lambda e: e["mtime"], reverse=True)
+
+    def remove(self, key):
+        for fmt in self.FORMATS:
+            try:
+                os.remove(self.path(key, fmt))
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """超出 max_bytes 时按最近最少使用顺序淘汰，返回淘汰条目数"""
+        entries = self.list_entries()
+        total = sum(e["size"] for e in entries)
+        removed = 0
+        while entries and total > self.max_bytes:
+            e = entries.pop()
+            self.remove(e["key"])
+            total -= e["size"]
+            removed += 1
+        return removed
+
+    def purge(self, older_than_days=None):
+        """清除缓存；older_than_days 为 None 时清空全部，返回清除条目数"""
+        cutoff = None if older_than_days is None else time.time() - older_than_days * 86400
+        removed = 0
+        for e in self.list_entries():
+            if cutoff is None or e["mtime"] < cutoff:
+                self.remove(e["key"])
+                removed += 1
+        return removed
 
 def main():
     print("="*60 + "\n  铁板神数排盘系统 (完整版)\n" + "="*60)
@@ -795,20 +1537,35 @@ def main():
             print("【错误】求测时间转换失败！")
             return
         
-        # 开始排盘
-        print("\n>>> 正在进行铁板神数排盘...")
-        calculator = TieBanCalculator()
-        result = calculator.calculate({
+        payload = {
             "birth_info": info_b, 
             "query_info": info_q, 
             "gender": gender
-        })
+        }
+        cache = ReportCache()
+        key = cache.key(payload)
+        result = cache.load_result(key)
         
-        # 打印报告
-        calculator.print_report(result)
+        if result is not None:
+            # 命中缓存：无需加载数据库与重新排盘
+            print("\n>>> 命中缓存，直接读取已有排盘结果")
+            print(ReportRenderer().render_console(result))
+            if any(cache.get(key, fmt) is None for fmt in ("md", "html")):
+                cache.put(key, result, ReportRenderer())
+        else:
+            # 开始排盘
+            print("\n>>> 正在进行铁板神数排盘...")
+            calculator = TieBanCalculator()
+            result = calculator.calculate(payload)
+            
+            # 打印报告
+            calculator.print_report(result)
+            cache.put(key, result, calculator.renderer)
         
-        # 保存文件
-        calculator.save_to_md(result, info_b['date_str'], info_q['date_str'])
+        # 保存文件：缓存之外另存一份命名报告到 output/，不随缓存淘汰
+        for fmt in ("md", "html"):
+            fname = cache.save_report(key, fmt, info_b['date_str'], info_q['date_str'])
+            print(f"\n[完成] 排盘报告已保存至: {os.path.abspath(fname)}")
         
     except KeyboardInterrupt:
         print("\n\n程序已被用户中断")
@@ -816,5 +1573,65 @@ def main():
         print(f"\n\n程序运行出错: {e}")
         traceback.print_exc()
 
+def cli(argv):
+    """命令行子命令入口；不带参数运行时进入交互式排盘"""
+    parser = argparse.ArgumentParser(description="铁板神数排盘系统")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_cohort = sub.add_parser("cohort", help="群体统计：按出生时辰批量排盘并汇总分布")
+    p_cohort.add_argument("start_year", type=int)
+    p_cohort.add_argument("end_year", type=int)
+    p_cohort.add_argument("--query", required=True, help="求测时间 YYYY-MM-DD HH:MM（刻别、本命数等取决于它，须显式指定）")
+    p_cohort.add_argument("--gender", choices=["男", "女", "both"], default="both")
+    p_cohort.add_argument("--workers", type=int, default=None)
+    p_cohort.add_argument("--out", default="output")
+
+    p_cache = sub.add_parser("cache", help="查看或清理排盘结果缓存")
+    p_cache.add_argument("action", choices=["list", "purge"])
+    p_cache.add_argument("--older-than", type=float, default=None, help="purge 时仅清除超过指定天数未使用的条目")
+    p_cache.add_argument("--max-mb", type=float, default=None, help="按指定容量上限执行一次淘汰")
+
+    p_bench = sub.add_parser("bench", help="性能基准测试")
+    p_bench.add_argument("target", choices=["render", "calc", "stress"])
+    p_bench.add_argument("-n", type=int, default=None, help="样本数，默认使用各项基准自身的默认值")
+    p_bench.add_argument("--executor", choices=["thread", "process"], default="thread", help="stress 使用的执行器")
+    p_bench.add_argument("--workers", type=int, default=None, help="render 的批量渲染进程数 / stress 的执行器线程或进程数")
+
+    args = parser.parse_args(argv)
+    if args.command == "cohort":
+        query_dt = datetime.datetime.strptime(args.query, "%Y-%m-%d %H:%M")
+        genders = ("男", "女") if args.gender == "both" else (args.gender,)
+        stats = run_cohort_analysis(args.start_year, args.end_year, query_dt, genders, args.workers)
+        # 求测时间与性别都会改变统计结果，写进文件名，不同批次互不覆盖
+        prefix = f"cohort_{args.start_year}_{args.end_year}_{query_dt:%Y%m%d-%H%M}_{args.gender}"
+        for path in stats.write_tables(args.out, prefix):
+            print(f"[完成] 统计表已保存至: {os.path.abspath(path)}")
+    elif args.command == "cache":
+        cache = ReportCache()
+        if args.max_mb is not None:
+            cache.max_bytes = int(args.max_mb * 1024 * 1024)
+            print(f"按 {args.max_mb} MB 上限淘汰 {cache.evict()} 条")
+        if args.action == "list":
+            entries = cache.list_entries()
+            for e in entries:
+                mtime = datetime.datetime.fromtimestamp(e["mtime"]).strftime("%Y-%m-%d %H:%M:%S")
+                print(f"{e['key']}  {e['size']:>8} B  {mtime}  {','.join(sorted(e['formats']))}")
+            print(f"共 {len(entries)} 条，{sum(e['size'] for e in entries)} B")
+        else:
+            print(f"已清除 {cache.purge(args.older_than)} 条缓存")
+    elif args.command == "bench":
+        # 基准测试及其旧版对照写法单独放在 bench.py，按需导入
+        import bench
+        n = {} if args.n is None else {"n": args.n}
+        if args.target == "render":
+            bench.bench_render(workers=args.workers, **n)
+        elif args.target == "calc":
+            bench.bench_calc(**n)
+        elif args.target == "stress":
+            bench.bench_stress(executor=args.executor, workers=args.workers, **n)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        cli(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file